@@ -0,0 +1,80 @@
+"""
+字体内存基准测试：对比 mmap 与 memory 两种字体加载方式下每个工作进程的内存占用
+
+启动若干工作进程，每个进程以多个字号加载同一字体并各渲染一次，然后在所有
+进程都存活时读取各自的 RSS 和 PSS（仅Linux）。mmap 方式下字体字节在进程间
+共享，工作进程增多时每个进程的 PSS 应基本保持不变。大字体（如20MB的中文字体）
+效果最明显。
+
+用法:
+    python benchmarks/bench_font_memory.py --font 字体路径 [--workers 4] [--sizes 8]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_to_image import (  # noqa: E402
+    FONT_LOAD_MODES,
+    process_memory,
+    render_text_image,
+    set_font_load_mode,
+)
+
+
+def _worker(mode, font_path, sizes, results, ready, done):
+    set_font_load_mode(mode)
+    for size in sizes:
+        render_text_image("字体内存 font memory 123", font_path, font_size=size)
+    ready.wait()
+    results.put((os.getpid(), process_memory()))
+    done.wait()
+
+
+def measure(mode, font_path, workers, sizes):
+    """返回每个工作进程的 (进程号, 内存占用) 列表"""
+    results = multiprocessing.Queue()
+    ready = multiprocessing.Barrier(workers + 1)
+    done = multiprocessing.Event()
+    procs = [multiprocessing.Process(target=_worker,
+                                     args=(mode, font_path, sizes, results, ready, done))
+             for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    # 所有进程加载完毕后再同时测量，使共享页按实际共享进程数均摊
+    ready.wait()
+    usage = sorted(results.get() for _ in range(workers))
+    done.set()
+    for proc in procs:
+        proc.join()
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mmap / memory 字体加载方式的内存对比")
+    parser.add_argument("--font", required=True, help="字体文件路径（越大越能体现差异）")
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数（默认4）")
+    parser.add_argument("--sizes", type=int, default=8, help="每个进程加载的字号个数（默认8）")
+    args = parser.parse_args()
+
+    if process_memory() is None:
+        print("当前系统无法读取 /proc，无法测量进程内存")
+        return 1
+    sizes = [12 + 6 * i for i in range(args.sizes)]
+    print(f"字体 {os.path.basename(args.font)}（{os.path.getsize(args.font) / 1024 / 1024:.1f} MB），"
+          f"{args.workers} 个工作进程，每个加载 {len(sizes)} 个字号")
+    for mode in FONT_LOAD_MODES:
+        usage = measure(mode, args.font, args.workers, sizes)
+        total_pss = sum(memory.get("pss", 0) for _, memory in usage)
+        for pid, memory in usage:
+            print(f"{mode:<7} 进程 {pid}: " + "，".join(
+                f"{name.upper()} {value / 1024 / 1024:.1f} MB" for name, value in memory.items()
+            ))
+        print(f"{mode:<7} PSS 合计: {total_pss / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
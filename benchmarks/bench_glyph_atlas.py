@@ -0,0 +1,76 @@
+"""
+字形图集后端基准测试：同一字体、字号下批量渲染短标签，对比 draw 与 atlas 后端的吞吐量
+
+测速前先在多个字号下对比两个后端的彩色输出（含字距对），报告最大逐像素通道差
+（预期不超过1，见 _GlyphAtlas 的误差说明）。
+
+用法:
+    python benchmarks/bench_glyph_atlas.py [--font 字体路径] [--count 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageChops  # noqa: E402
+
+from text_to_image import render_text_image  # noqa: E402
+
+# 含常见字距对（AV、To、Wa、Yo ...）和墨迹相接的连字（ffi、fj、rt）的长行，
+# 字号越大笔位累积误差越明显
+_CHECK_TEXT = ("AVAVA Tomorrow, Wave! Yesterday LTAVWAY Tr Ty Vo We Yo 'quoted' F. P. "
+               "ffi fj rt 0123456789")
+_CHECK_SIZES = (12, 24, 40, 61, 97, 150)
+
+
+def _labels(count):
+    """生成不重复的标签文本"""
+    return [f"Label #{i:05d} · SKU-{i * 7919 % 100000:05d}" for i in range(count)]
+
+
+def check(font_path):
+    """
+    返回各字号下 draw 与 atlas 输出的最大逐像素通道差 {字号: 差值}
+
+    使用彩色文字和背景：白底黑字时混合取整误差恰好为0，测不出相邻字形重叠处的差异
+    """
+    diffs = {}
+    for size in _CHECK_SIZES:
+        images = [render_text_image(_CHECK_TEXT, font_path, font_size=size, width=6000,
+                                    text_color=(200, 30, 70), bg_color=(240, 240, 210),
+                                    backend=backend) for backend in ("draw", "atlas")]
+        diffs[size] = max(high for _, high in ImageChops.difference(*images).getextrema())
+    return diffs
+
+
+def bench(backend, labels, font_path, font_size):
+    """返回指定后端的每秒渲染张数"""
+    # 预热：加载字体、构建字形度量和图集
+    render_text_image(labels[0], font_path, font_size=font_size, backend=backend)
+    start = time.perf_counter()
+    for label in labels:
+        render_text_image(label, font_path, font_size=font_size, backend=backend)
+    return len(labels) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="draw / atlas 绘制后端吞吐量对比")
+    parser.add_argument("--font", default="", help="字体文件路径（默认使用Pillow内置字体）")
+    parser.add_argument("--font-size", type=int, default=24)
+    parser.add_argument("--count", type=int, default=2000, help="渲染的标签数量")
+    args = parser.parse_args()
+
+    diffs = check(args.font)
+    print("draw / atlas 最大通道差: " + "，".join(f"{size}px {diff}" for size, diff in diffs.items()))
+    labels = _labels(args.count)
+    results = {backend: bench(backend, labels, args.font, args.font_size)
+               for backend in ("draw", "atlas")}
+    for backend, rate in results.items():
+        print(f"{backend:>6}: {rate:8.1f} 张/秒")
+    print(f"atlas 相对 draw 加速: {results['atlas'] / results['draw']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+条带并发光栅化基准测试：在海报级大画布上对比串行渲染与按条带并发渲染
+
+对每种并发方式（thread/process）和工作者数（1、2、4 ... CPU核数）报告耗时、
+相对串行的加速比，并校验结果与串行渲染逐字节相同。
+
+用法:
+    python benchmarks/bench_parallel_bands.py [--font 字体路径] [--width 8000] [--lines 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_to_image import PARALLEL_MODES, render_text_image  # noqa: E402
+
+
+def _poster_text(lines):
+    """生成长度各不相同的多行文本"""
+    sample = "The quick brown fox jumps over the lazy dog. 天地玄黄宇宙洪荒 "
+    return "\n".join(f"{i:05d} " + sample * (1 + i % 5) for i in range(lines))
+
+
+def _worker_counts():
+    """1、2、4 ... 直到CPU核数"""
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def timed(**kwargs):
+    start = time.perf_counter()
+    img = render_text_image(**kwargs)
+    return img, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="条带并发光栅化与串行渲染对比")
+    parser.add_argument("--font", default="", help="字体文件路径（默认使用Pillow内置字体）")
+    parser.add_argument("--font-size", type=int, default=48)
+    parser.add_argument("--width", type=int, default=8000, help="画布宽度")
+    parser.add_argument("--lines", type=int, default=2000, help="文本行数（决定画布高度）")
+    parser.add_argument("--backend", default="atlas", choices=["draw", "atlas"])
+    args = parser.parse_args()
+
+    params = dict(
+        text=_poster_text(args.lines),
+        font_path=args.font,
+        font_size=args.font_size,
+        width=args.width,
+        backend=args.backend,
+    )
+    # 预热：加载字体、构建字形度量和图集
+    render_text_image(**dict(params, text="warm up"))
+    serial, serial_time = timed(**params)
+    reference = serial.tobytes()
+    print(f"画布 {serial.size[0]}x{serial.size[1]}，CPU核数 {os.cpu_count()}")
+    print(f"{'serial':<10} {'-':>3} {serial_time:8.2f} s {1.0:6.2f}x")
+    for mode in PARALLEL_MODES:
+        for workers in _worker_counts():
+            img, elapsed = timed(**params, parallel=workers, parallel_mode=mode)
+            identical = "" if img.tobytes() == reference else "  <-- 与串行结果不一致"
+            print(f"{mode:<10} {workers:>3} {elapsed:8.2f} s {serial_time / elapsed:6.2f}x{identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+渲染流水线基准测试
+
+按矩阵（文本长度 × 文字种类 × 字号 × 画布预设 × 输出格式）驱动
+render_text_image + encode，报告每个用例的吞吐量（张/秒）和各阶段耗时，
+结果保存为JSON，可与基线结果对比以发现性能回退。
+
+默认使用Pillow内置字体和一个离线生成的合成字体（见 synthetic_font.py，覆盖
+全部样例文字），无需联网或额外字体文件，完整矩阵都能运行；可通过 --font 追加
+本地字体（如中文字体）参与测试。字体的 cmap 不包含某种文字时跳过对应用例
+（否则测的是缺字方框），例如内置字体没有中文字形，只运行 latin 用例。
+
+用法:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --baseline bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PIL  # noqa: E402
+
+from text_to_image import (  # noqa: E402
+    SIZE_PRESETS,
+    RenderStats,
+    _load_font,
+    _read_cmap_ranges,
+    clear_font_cache,
+    encode,
+    render_text_image,
+    summarize_stats,
+)
+from synthetic_font import synthetic_font_path  # noqa: E402
+
+_LATIN = (
+    "The quick brown fox jumps over the lazy dog. Pack my box with five dozen "
+    "liquor jugs. How vexingly quick daft zebras jump! "
+)
+_CJK = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏闰余成岁律吕调阳云腾致雨露结为霜。"
+_MIXED = "Pillow 渲染 benchmark：中英文 mixed 排版 test 123，标点、空格 and 换行。"
+
+TEXTS = {
+    "latin": _LATIN,
+    "cjk": _CJK,
+    "mixed": _MIXED,
+}
+LENGTHS = {"short": 1, "long": 30}
+FONT_SIZES = (16, 40, 96)
+FORMATS = ("PNG", "JPEG", "WEBP")
+
+
+def _covers(font_path, text):
+    """字体的 cmap 是否包含 text 中所有非空白字符；无法解析 cmap 的字体视为包含"""
+    font = _load_font(font_path, 40)
+    try:
+        if font_path:
+            with open(font_path, "rb") as f:
+                data = f.read()
+        else:
+            # 新版本Pillow的内置字体是内嵌的TrueType字体，旧版本为位图字体
+            data = font.font_bytes
+        ranges = _read_cmap_ranges(data, getattr(font, "index", 0))
+    except (AttributeError, OSError, ValueError, struct.error):
+        return True
+    return all(any(start <= ord(char) <= end for start, end in ranges)
+               for char in set(text) if not char.isspace())
+
+
+def _cases(fonts, quick, skipped):
+    """生成测试矩阵，字体不包含的文字种类记入 skipped 并跳过"""
+    covered = {(font, script): _covers(font, sample)
+               for font in fonts for script, sample in TEXTS.items()}
+    lengths = {"short": 1, "long": 10} if quick else LENGTHS
+    sizes = (40,) if quick else FONT_SIZES
+    presets = SIZE_PRESETS[1:2] if quick else SIZE_PRESETS
+    formats = ("PNG",) if quick else FORMATS
+    for font, (script, sample), (length, repeat), font_size, preset, fmt in itertools.product(
+        fonts, TEXTS.items(), lengths.items(), sizes, presets, formats
+    ):
+        _, width, height = preset
+        case_id = (f"{os.path.basename(font) or 'default'}/{script}-{length}/"
+                   f"{font_size}px/{width}x{height}/{fmt.lower()}")
+        if not covered[font, script]:
+            skipped.append(case_id)
+            continue
+        yield {
+            "id": case_id,
+            "font": font,
+            "text": "\n".join([sample] * repeat) if length == "long" else sample,
+            "font_size": font_size,
+            "width": width,
+            "height": height,
+            "format": fmt,
+        }
+
+
+def run_case(case, iterations):
+    """运行单个用例，返回吞吐量和各阶段耗时分位数"""
+    def render_once(stats=None):
+        img = render_text_image(
+            case["text"],
+            case["font"],
+            font_size=case["font_size"],
+            width=case["width"],
+            height=case["height"],
+            stats=stats,
+        )
+        return encode(img, case["format"], stats=stats)
+
+    # 预热一次，排除首次加载字体和构建字形缓存的开销
+    render_once()
+    records = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        stats = RenderStats()
+        render_once(stats)
+        records.append(stats)
+    elapsed = time.perf_counter() - start
+    summary = summarize_stats(records)
+    return {
+        "id": case["id"],
+        "images_per_sec": iterations / elapsed,
+        "phases_p50": {name: values["p50"] for name, values in summary.items()},
+        "encoded_bytes": records[-1].encoded_bytes,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """与基线对比，返回吞吐量下降超过 tolerance 的用例"""
+    previous = {r["id"]: r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result["id"])
+        if old is None:
+            continue
+        ratio = result["images_per_sec"] / old["images_per_sec"]
+        marker = ""
+        if ratio < 1 - tolerance:
+            regressions.append(result["id"])
+            marker = "  <-- 回退"
+        print(f"{result['id']:<60} {ratio:6.2f}x{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字转图片渲染基准测试")
+    parser.add_argument("--font", action="append", default=[],
+                        help="追加参与测试的字体文件（可重复指定），内置字体和合成字体总是参与")
+    parser.add_argument("--iterations", type=int, default=5, help="每个用例的渲染次数（默认5）")
+    parser.add_argument("--quick", action="store_true", help="只运行缩小的矩阵")
+    parser.add_argument("--filter", type=str, help="只运行 id 包含该字符串的用例")
+    parser.add_argument("--output", type=str, help="结果JSON的保存路径")
+    parser.add_argument("--baseline", type=str, help="用于对比的基线结果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="吞吐量下降超过该比例视为回退（默认0.1）")
+    args = parser.parse_args()
+
+    clear_font_cache()
+    results = []
+    skipped = []
+    synthetic = synthetic_font_path("".join(TEXTS.values()))
+    for case in _cases(["", synthetic] + args.font, args.quick, skipped):
+        if args.filter and args.filter not in case["id"]:
+            continue
+        result = run_case(case, args.iterations)
+        results.append(result)
+        print(f"{result['id']:<60} {result['images_per_sec']:9.1f} 张/秒")
+    if skipped:
+        fonts = sorted({case_id.split("/")[0] for case_id in skipped})
+        print(f"跳过 {len(skipped)} 个用例：字体 {', '.join(fonts)} 不包含对应文字的字形")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "iterations": args.iterations,
+            "skipped": skipped,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n与基线对比（吞吐量比值）:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"发现 {len(regressions)} 个性能回退用例")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# cmap 解析与字形覆盖索引测试：_read_cmap_ranges / _cmap_format4 / _cmap_format12 / _get_coverage
+# 可直接运行（python test_cmap.py），也可用 pytest 运行
+import os
+import struct
+import sys
+import tempfile
+
+from text_to_image import _COVERAGE_CACHE, _get_coverage, _read_cmap_ranges
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from synthetic_font import build_font  # noqa: E402
+
+
+def _format4(segments):
+    """格式4子表；segments 为 (起点, 终点, delta, 字形号列表)，字形号列表不为 None 时用 idRangeOffset 映射"""
+    segments = list(segments) + [(0xFFFF, 0xFFFF, 1, None)]
+    count = len(segments)
+    glyph_array, range_offsets = [], []
+    for i, (_, _, _, glyphs) in enumerate(segments):
+        if glyphs is None:
+            range_offsets.append(0)
+        else:
+            range_offsets.append(2 * (count - i) + 2 * len(glyph_array))
+            glyph_array.extend(glyphs)
+    body = struct.pack(f">{count}H", *(end for _, end, _, _ in segments))
+    body += struct.pack(">H", 0)
+    body += struct.pack(f">{count}H", *(start for start, _, _, _ in segments))
+    body += struct.pack(f">{count}H", *(delta % 0x10000 for _, _, delta, _ in segments))
+    body += struct.pack(f">{count}H", *range_offsets)
+    body += struct.pack(f">{len(glyph_array)}H", *glyph_array)
+    return struct.pack(">HHHHHHH", 4, 14 + len(body), 0, 2 * count, 0, 0, 0) + body
+
+
+def _format12(groups):
+    """格式12子表；groups 为 (起点, 终点, 起始字形号)"""
+    body = b"".join(struct.pack(">III", *group) for group in groups)
+    return struct.pack(">HHIII", 12, 0, 16 + len(body), 0, len(groups)) + body
+
+
+def _cmap(*subtables):
+    """cmap 表；subtables 为 (platform_id, encoding_id, 子表字节)"""
+    data = struct.pack(">HH", 0, len(subtables))
+    offset = 4 + 8 * len(subtables)
+    for platform_id, encoding_id, subtable in subtables:
+        data += struct.pack(">HHI", platform_id, encoding_id, offset)
+        offset += len(subtable)
+    return data + b"".join(subtable for _, _, subtable in subtables)
+
+
+def _sfnt(cmap, base=0):
+    """只含 cmap 表的字体；base 为该字体在文件（如TTC）中的起始偏移"""
+    header = struct.pack(">IHHHH", 0x00010000, 1, 16, 0, 0)
+    return header + struct.pack(">4sIII", b"cmap", 0, base + 28, len(cmap)) + cmap
+
+
+def test_format4_delta_segments():
+    cmap = _cmap((3, 1, _format4([
+        (0x41, 0x43, 1 - 0x41, None),   # A-C -> 字形1-3
+        (0x61, 0x63, -0x62, None),      # b 映射到字形0（缺字），a、c 有字形
+    ])))
+    assert _read_cmap_ranges(_sfnt(cmap)) == [[0x41, 0x43], [0x61, 0x61], [0x63, 0x63]]
+
+
+def test_format4_glyph_id_array():
+    cmap = _cmap((3, 1, _format4([(0x30, 0x33, 0, [5, 0, 7, 8])])))
+    assert _read_cmap_ranges(_sfnt(cmap)) == [[0x30, 0x30], [0x32, 0x33]]
+
+
+def test_format12_preferred_over_format4():
+    cmap = _cmap(
+        (3, 1, _format4([(0x41, 0x41, 1 - 0x41, None)])),
+        (3, 10, _format12([(0x1F600, 0x1F602, 10), (0x4E00, 0x4E01, 0)])),
+    )
+    # 起始字形号为0的组只排除第一个码位
+    assert _read_cmap_ranges(_sfnt(cmap)) == [[0x4E01, 0x4E01], [0x1F600, 0x1F602]]
+
+
+def test_font_collection_index():
+    first = _cmap((3, 1, _format4([(0x41, 0x41, 1 - 0x41, None)])))
+    second = _cmap((3, 1, _format4([(0x5000, 0x5001, 1 - 0x5000, None)])))
+    header_size = 12 + 4 * 2
+    first_font = _sfnt(first, header_size)
+    second_font = _sfnt(second, header_size + len(first_font))
+    data = struct.pack(">4sIIII", b"ttcf", 0x00010000, 2, header_size,
+                       header_size + len(first_font)) + first_font + second_font
+    assert _read_cmap_ranges(data, 0) == [[0x41, 0x41]]
+    assert _read_cmap_ranges(data, 1) == [[0x5000, 0x5001]]
+    try:
+        _read_cmap_ranges(data, 2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("超出字体集合范围的下标应报错")
+
+
+def test_missing_cmap_raises():
+    data = struct.pack(">IHHHH", 0x00010000, 0, 0, 0, 0)
+    try:
+        _read_cmap_ranges(data)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("没有 cmap 表的字体应报错")
+
+
+def test_synthetic_font_ranges():
+    ranges = _read_cmap_ranges(build_font("ABC天地 "))
+    assert ranges == [[0x20, 0x20], [0x41, 0x43], [0x5730, 0x5730], [0x5929, 0x5929]]
+
+
+def test_coverage_bitmap_and_disk_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        font_path = os.path.join(tmp, "font.ttf")
+        with open(font_path, "wb") as f:
+            f.write(build_font("ABC天地"))
+        old = os.environ.get("TEXT_TO_IMAGE_CACHE_DIR")
+        os.environ["TEXT_TO_IMAGE_CACHE_DIR"] = os.path.join(tmp, "coverage")
+        try:
+            coverage = _get_coverage(font_path, None)
+
+            def covered(char):
+                return bool(coverage[ord(char) >> 3] & (1 << (ord(char) & 7)))
+
+            assert all(covered(char) for char in "ABC天地")
+            assert not any(covered(char) for char in "Da玄")
+            # 区间表写入磁盘缓存，清空内存缓存后从磁盘读取得到相同结果
+            assert len(os.listdir(os.path.join(tmp, "coverage"))) == 1
+            _COVERAGE_CACHE.clear()
+            assert _get_coverage(font_path, None) == coverage
+        finally:
+            _COVERAGE_CACHE.clear()
+            if old is None:
+                del os.environ["TEXT_TO_IMAGE_CACHE_DIR"]
+            else:
+                os.environ["TEXT_TO_IMAGE_CACHE_DIR"] = old
+
+
+def test_builtin_font_has_no_coverage_index():
+    # 内置字体（空路径）视为覆盖所有字符
+    assert _get_coverage("", None) is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,58 @@
+# 换行规则测试：_break_spans / _break_paragraph（每个字符宽度为1，可用宽度即每行字符数）
+# 可直接运行（python test_line_breaking.py），也可用 pytest 运行
+from text_to_image import _break_paragraph, _break_spans
+
+
+def _lines(paragraph, available):
+    return _break_paragraph(paragraph, [1.0] * len(paragraph), available)
+
+
+def test_latin_breaks_at_spaces():
+    assert _lines("hello world foo", 11) == ["hello world", "foo"]
+    # 行尾空格悬挂在可用宽度之外，不会被挤到下一行开头
+    assert _lines("hello world", 5) == ["hello", "world"]
+
+
+def test_long_word_is_split_at_available_width():
+    assert _lines("abcdefgh", 3) == ["abc", "def", "gh"]
+
+
+def test_break_after_hyphen():
+    assert _lines("well-known", 7) == ["well-", "known"]
+
+
+def test_cjk_breaks_between_characters():
+    assert _lines("天地玄黄宇宙", 4) == ["天地玄黄", "宇宙"]
+    assert _lines("中文abc", 3) == ["中文", "abc"]
+
+
+def test_closing_punctuation_never_starts_a_line():
+    assert _lines("天地玄黄。宇宙", 4) == ["天地玄", "黄。宇宙"]
+    assert _lines("天地玄黄，宇宙洪荒", 4) == ["天地玄", "黄，宇宙", "洪荒"]
+
+
+def test_opening_punctuation_never_ends_a_line():
+    assert _lines("天地玄「黄宇", 4) == ["天地玄", "「黄宇"]
+    assert _lines("天地（玄黄）", 3) == ["天地", "（玄", "黄）"]
+
+
+def test_every_line_has_at_least_one_character():
+    assert _lines("天地", 0.5) == ["天", "地"]
+
+
+def test_spans_exclude_trailing_whitespace():
+    paragraph = "ab  cd"
+    spans = _break_spans(paragraph, [1.0] * len(paragraph), 3)
+    assert spans == [(0, 2), (4, 6)]
+
+
+def test_empty_paragraph():
+    assert _break_spans("", [], 10) == [(0, 0)]
+    assert _lines("", 10) == [""]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,93 @@
+# 磁盘渲染缓存测试：命中/未命中、重复存入的大小统计、按最近使用时间淘汰
+# 可直接运行（python test_render_cache.py），也可用 pytest 运行
+import os
+import tempfile
+
+from text_to_image_cache import RenderCache, cached_create_text_image
+
+
+def _source(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def _disk_bytes(cache):
+    return sum(size for _, size, _ in cache._entries())
+
+
+def test_store_and_fetch():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"))
+        key = cache.key({"text": "a", "output_path": "a.png"})
+        output = os.path.join(tmp, "out.png")
+        assert cache.fetch(key, output) is None
+        cache.store(key, _source(tmp, "src", 100), (12, 34))
+        assert cache.fetch(key, output) == (12, 34)
+        assert os.path.getsize(output) == 100
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["bytes_saved"]) == (1, 1, 100)
+        assert stats["hit_ratio"] == 0.5
+
+
+def test_key_depends_on_params_and_format():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(tmp)
+        base = {"text": "a", "font_size": 40, "output_path": "x.png"}
+        key = cache.key(base)
+        # 输出路径本身不影响缓存键，扩展名（格式）和渲染参数影响
+        assert cache.key(dict(base, output_path="other/y.png")) == key
+        assert cache.key(dict(base, output_path="x.jpg")) != key
+        assert cache.key(dict(base, font_size=41)) != key
+
+
+def test_restore_does_not_double_count():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"))
+        key = cache.key({"text": "a"})
+        cache.store(key, _source(tmp, "big", 300), (1, 1))
+        cache.store(key, _source(tmp, "small", 120), (1, 1))
+        assert cache.stats()["cache_bytes"] == 120 == _disk_bytes(cache)
+        # 重新打开缓存目录时从磁盘统计总大小（.meta 不计入）
+        assert RenderCache(cache.cache_dir).stats()["cache_bytes"] == 120
+
+
+def test_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"), max_bytes=1000)
+        keys = [cache.key({"text": str(i)}) for i in range(4)]
+        for i, key in enumerate(keys[:3]):
+            cache.store(key, _source(tmp, f"src{i}", 300), (i, i))
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        # 最旧的条目刚被使用过，淘汰时应保留
+        assert cache.fetch(keys[0], os.path.join(tmp, "out")) == (0, 0)
+        cache.store(keys[3], _source(tmp, "src3", 300), (3, 3))
+
+        assert cache.stats()["cache_bytes"] <= 900
+        assert cache.stats()["cache_bytes"] == _disk_bytes(cache)
+        assert not os.path.exists(cache._path(keys[1]))
+        assert not os.path.exists(cache._path(keys[1]) + ".meta")
+        for key in (keys[0], keys[3]):
+            assert os.path.exists(cache._path(key))
+
+
+def test_cached_create_text_image():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(os.path.join(tmp, "cache"))
+        params = dict(text="缓存测试", font_path="", output_path=os.path.join(tmp, "a.png"),
+                      width=200, height=80)
+        size, hit = cached_create_text_image(cache, **params)
+        assert (size, hit) == ((200, 80), False)
+        params["output_path"] = os.path.join(tmp, "b.png")
+        size, hit = cached_create_text_image(cache, **params)
+        assert (size, hit) == ((200, 80), True)
+        with open(os.path.join(tmp, "a.png"), "rb") as a, open(params["output_path"], "rb") as b:
+            assert a.read() == b.read()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
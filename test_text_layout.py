@@ -0,0 +1,81 @@
+# 增量排版测试：TextLayout.render 的输出应与相同参数的 render_text_image 逐像素一致
+# 可直接运行（python test_text_layout.py），也可用 pytest 运行
+import os
+import sys
+
+from text_to_image import TextLayout, render_text_image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from synthetic_font import synthetic_font_path  # noqa: E402
+
+_TEXT = "第一段 first paragraph\n天地玄黄，宇宙洪荒。日月盈昃，辰宿列张。\n\nlast line"
+_FONT = synthetic_font_path(_TEXT + "inserted 插入的段落 edited")
+
+
+def _assert_same(layout, text, **style):
+    expected = render_text_image(text, **style)
+    actual = layout.render(text)
+    assert actual.size == expected.size
+    assert actual.tobytes() == expected.tobytes()
+
+
+def test_first_render_matches():
+    style = dict(font_path=_FONT, font_size=24, width=300, padding=10)
+    _assert_same(TextLayout(**style), _TEXT, **style)
+
+
+def test_incremental_edits_match():
+    style = dict(font_path=_FONT, font_size=24, width=300, height=400, padding=10,
+                 horizontal_align="right", vertical_align="top",
+                 text_color=(200, 30, 70), bg_color=(240, 240, 210))
+    layout = TextLayout(**style)
+    _assert_same(layout, _TEXT, **style)
+
+    edited = _TEXT.replace("last line", "last line edited")
+    _assert_same(layout, edited, **style)
+    # 只改了最后一段，重绘的条带不应覆盖整张图片
+    top, bottom = layout.dirty_band
+    assert 0 < top < bottom <= 400
+
+    inserted = edited.replace("\n\n", "\ninserted 插入的段落\n\n")
+    _assert_same(layout, inserted, **style)
+
+    layout.render(inserted)
+    assert layout.dirty_band is None
+
+
+def test_style_changes_match():
+    style = dict(font_path=_FONT, font_size=24, width=300, padding=10)
+    layout = TextLayout(**style)
+    layout.render(_TEXT)
+    for change in ({"font_size": 32}, {"text_color": (0, 0, 255)}, {"width": 200},
+                   {"horizontal_align": "left", "vertical_align": "bottom"}):
+        style.update(change)
+        layout.set_style(**change)
+        _assert_same(layout, _TEXT, **style)
+
+
+def test_scaled_preview_matches():
+    style = dict(font_path=_FONT, font_size=24, width=300, padding=10, scale=0.5)
+    _assert_same(TextLayout(**style), _TEXT, **style)
+
+
+def test_atlas_backend_matches():
+    style = dict(font_path=_FONT, font_size=24, width=300, padding=10, backend="atlas")
+    layout = TextLayout(**style)
+    _assert_same(layout, _TEXT, **style)
+    _assert_same(layout, _TEXT + " more", **style)
+
+
+def test_builtin_font_matches():
+    style = dict(font_path="", font_size=20, width=240, padding=8)
+    layout = TextLayout(**style)
+    _assert_same(layout, "hello world, this wraps", **style)
+    _assert_same(layout, "hello world, this wraps again", **style)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -2,12 +2,53 @@
 try:
     from PIL import Image, ImageDraw, ImageFont
 except ImportError:
-    print("错误: 缺少Pillow库。请运行 'pip install pillow' 安装依赖。")
-    print("如果pip命令不可用，请尝试 'python -m pip install pillow'")
+    import sys
+    print("错误: 缺少Pillow库。请运行 'pip install pillow' 安装依赖。", file=sys.stderr)
+    print("如果pip命令不可用，请尝试 'python -m pip install pillow'", file=sys.stderr)
     # 这里不抛出异常，让用户看到错误信息
 
 import argparse
-import textwrap
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from io import BytesIO
+from itertools import accumulate
+
+
+# 进程级字体缓存：同一进程内的CLI、GUI预览和批量调用共享
+# 键为 (解析后的路径, 文件修改时间, 文件大小, 字体索引, 字号)
+_FONT_CACHE_MAX = 32
+_FONT_CACHE = OrderedDict()
+# 字体文件原始字节（memory 加载方式），按 (路径, 修改时间, 文件大小) 缓存，各字号共用
+_FONT_DATA_CACHE = OrderedDict()
+_FONT_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_FONT_CACHE_LOCK = threading.RLock()
+# 已提示过无法加载的字体路径
+_FONT_WARNINGS = set()
+# 字体加载方式：mmap 按路径交给FreeType打开（POSIX上直接映射字体文件），同一字体的
+# 所有字号以及所有工作进程共享操作系统页缓存中的同一份字节；memory 先把文件读入
+# 内存再加载，不保持字体文件打开，但Pillow会为每个字号的字体对象复制一份完整的
+# 字体字节，大字体（如中文字体）内存开销很大，仅在需要时显式选择
+FONT_LOAD_MODES = ("mmap", "memory")
+_FONT_LOAD_MODE = "mmap"
+
+# 预设图片尺寸（GUI尺寸选择页和基准测试共用）
+SIZE_PRESETS = [
+    ("小 (400x300)", 400, 300),
+    ("中 (800x600)", 800, 600),
+    ("大 (1200x900)", 1200, 900),
+    ("正方形 (600x600)", 600, 600),
+    ("宽屏 (1920x1080)", 1920, 1080)
+]
 
 
 def create_text_image(
@@ -22,6 +63,13 @@ def create_text_image(
     horizontal_align="center",
     vertical_align="center",
     padding=20,
+    backend="draw",
+    stats=None,
+    format=None,
+    encode_opts=None,
+    color_mode="auto",
+    parallel=None,
+    parallel_mode="process",
 ):
     """
     创建带有特定样式的文字图片
@@ -38,78 +86,1182 @@ def create_text_image(
         horizontal_align: 水平对齐(left/center/right)
         vertical_align: 垂直对齐(top/center/bottom)
         padding: 文字与图片边缘的间距
+        backend: 绘制后端，"draw"逐行调用 draw.text，"atlas"使用字形图集
+        stats: 可选的 RenderStats 对象，用于记录各阶段耗时等统计
+        format: 输出格式（PNG/JPEG/WEBP/PPM/RAW），默认按扩展名推断；
+                RAW 为不带文件头的原始RGB像素流
+        encode_opts: 编码参数（见 encode_options），透传给 Image.save
+        color_mode: 颜色模式（见 render_text_image），"auto" 在输出格式支持
+                    调色板时自动使用双色调色板模式，否则使用RGB
+        parallel: 条带并发光栅化的工作者数（见 render_text_image）
+        parallel_mode: 条带并发方式，"process"（默认）或 "thread"
+        output_path 为 "-" 时图片字节写到标准输出，便于管道传给下游工具
+    """
+    format = _output_format(output_path, format)
+    color_mode = _resolve_color_mode(color_mode, format)
+    img = render_text_image(
+        text,
+        font_path,
+        font_size=font_size,
+        text_color=text_color,
+        bg_color=bg_color,
+        width=width,
+        height=height,
+        horizontal_align=horizontal_align,
+        vertical_align=vertical_align,
+        padding=padding,
+        backend=backend,
+        stats=stats,
+        color_mode=color_mode,
+        parallel=parallel,
+        parallel_mode=parallel_mode,
+    )
+    _save_image(img, output_path, format, encode_opts, stats)
+    img_width, img_height = img.size
+    print(f"图片已保存至: {output_path}（分辨率：{img_width}x{img_height}）",
+          file=sys.stderr if output_path == "-" else sys.stdout)
+    return img_width, img_height
+
+
+COLOR_MODES = ("rgb", "palette", "L")
+# 能无损保存调色板图片的格式
+_PALETTE_FORMATS = {"PNG", "GIF", "BMP", "TIFF"}
+
+
+def _auto_color_mode(format):
+    """
+    自动选择颜色模式：文字只有一种颜色、背景是纯色，因此只要输出格式能
+    保存调色板图片，双色调色板模式的输出与RGB完全一致且更省内存和体积
+    """
+    return "palette" if format.upper() in _PALETTE_FORMATS else "rgb"
+
+
+def _resolve_color_mode(color_mode, format):
+    """解析 "auto" 颜色模式，并检查显式指定的调色板模式能否保存为该输出格式"""
+    format = format or "PNG"
+    if color_mode == "auto":
+        return _auto_color_mode(format)
+    if color_mode == "palette" and format.upper() not in _PALETTE_FORMATS:
+        raise ValueError(f"输出格式 {format} 不支持调色板颜色模式，请使用 rgb 或 L")
+    return color_mode
+
+
+def _colorize_mask(mask, text_color, bg_color, color_mode):
+    """
+    将文字覆盖度蒙版（0为背景，255为文字）转换为最终图片
+
+    调色板的256个颜色由Pillow自身的混合运算生成（与 draw.text 在RGB画布上
+    混合文字颜色的方式相同），因此着色结果与直接在RGB上绘制一致。
+    """
+    ramp = _color_ramp(text_color, bg_color)
+    if color_mode == "L":
+        return mask.point(list(ramp.convert("L").tobytes()))
+    img = mask.convert("P")
+    img.putpalette(ramp.tobytes())
+    return img
+
+
+def _color_ramp(text_color, bg_color):
+    """覆盖度 0-255 对应的256个颜色（256x1的RGB图片）"""
+    ramp = Image.new("RGB", (256, 1), bg_color)
+    ramp.paste(text_color, (0, 0, 256, 1), Image.frombytes("L", (256, 1), bytes(range(256))))
+    return ramp
+
+
+# 编码预设：fast 优先编码速度，small 优先文件体积；default 使用Pillow默认设置
+ENCODE_PRESETS = {
+    "default": {},
+    "fast": {
+        "PNG": {"compress_level": 1},
+        "JPEG": {"quality": 85},
+        "WEBP": {"quality": 80, "method": 0},
+    },
+    "small": {
+        "PNG": {"compress_level": 9, "optimize": True},
+        "JPEG": {"quality": 75, "optimize": True, "progressive": True},
+        "WEBP": {"quality": 75, "method": 6},
+    },
+}
+
+
+def encode_options(format, preset="default", compress_level=None, optimize=None,
+                   quality=None, lossless=None):
+    """
+    组合编码参数：先取预设，再用显式指定的参数覆盖
+
+    参数:
+        format: 输出格式（PNG/JPEG/WEBP...）
+        preset: 编码预设（default/fast/small）
+        compress_level: PNG 压缩级别（0-9）
+        optimize: PNG/JPEG 是否做额外的体积优化
+        quality: JPEG/WEBP 质量（1-100）
+        lossless: WEBP 是否无损
+    """
+    format = (format or "PNG").upper()
+    if preset not in ENCODE_PRESETS:
+        raise ValueError(f"未知的编码预设: {preset}")
+    opts = dict(ENCODE_PRESETS[preset].get(format, {}))
+    if format == "PNG":
+        if compress_level is not None:
+            opts["compress_level"] = compress_level
+        if optimize is not None:
+            opts["optimize"] = optimize
+    elif format == "JPEG":
+        if quality is not None:
+            opts["quality"] = quality
+        if optimize is not None:
+            opts["optimize"] = optimize
+    elif format == "WEBP":
+        if quality is not None:
+            opts["quality"] = quality
+        if lossless is not None:
+            opts["lossless"] = lossless
+    return opts
+
+
+def _output_format(output_path, format=None):
+    """确定输出格式：显式指定优先，否则按扩展名推断（.raw 为原始像素流）"""
+    if format:
+        format = format.upper()
+        return "JPEG" if format == "JPG" else format
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext == ".raw":
+        return "RAW"
+    return Image.registered_extensions().get(ext)
+
+
+def _save_image(img, output_path, format=None, encode_opts=None, stats=None):
+    """
+    按 format 保存图片（RAW 为原始像素流），output_path 为 "-" 时写到标准输出，
+    stats 记录编码耗时和编码后的字节数
+    """
+    if output_path == "-":
+        sys.stdout.buffer.write(encode(img, format or "PNG", stats=stats, **(encode_opts or {})))
+        sys.stdout.buffer.flush()
+        return
+    with _phase(stats, "encode"):
+        if format == "RAW":
+            with open(output_path, "wb") as f:
+                f.write(img.tobytes())
+        else:
+            img.save(output_path, format=format, **(encode_opts or {}))
+    if stats is not None:
+        stats.encoded_bytes = os.path.getsize(output_path)
+
+
+def render_text_image(
+    text,
+    font_path,
+    font_size=40,
+    text_color=(0, 0, 0),
+    bg_color=(255, 255, 255),
+    width=None,
+    height=None,
+    horizontal_align="center",
+    vertical_align="center",
+    padding=20,
+    backend="draw",
+    scale=1.0,
+    stats=None,
+    color_mode="rgb",
+    parallel=None,
+    parallel_mode="process",
+):
     """
+    在内存中渲染文字图片并返回 PIL.Image，不写入磁盘
+
+    参数与 create_text_image 相同（没有 output_path），另外:
+        scale: 预览缩放比例。排版（换行、行宽、位置）按原始分辨率计算，
+               只在光栅化时按比例缩小字体、边距和画布，因此预览与最终
+               输出的换行完全一致，像素量约为原来的 scale²
+        stats: 可选的 RenderStats 对象，用于记录各阶段耗时等统计
+        color_mode: "rgb" 直接在RGB画布上绘制；"palette"/"L" 在单通道蒙版上绘制，
+                    最后分别输出调色板（P）图片或灰度图片，内存为RGB的1/3
+        parallel: 大于1时把画布切成水平条带并发光栅化后拼接（适合海报级的大画布），
+                  结果与串行渲染逐字节相同
+        parallel_mode: 条带并发方式，"process"（进程，默认）或 "thread"（线程）。
+                       Pillow 的 FreeType 光栅化全程持有 GIL，线程模式下只有
+                       蒙版混合一步能并行，通常只在 atlas 后端下有少量收益
+    """
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"未知的颜色模式: {color_mode}")
+
     # 加载字体
-    font = _load_font(font_path, font_size)
+    with _phase(stats, "load_font"):
+        font = _load_font(font_path, font_size)
+    
+    # 按原始分辨率排版
+    wrapped_text, line_dimensions, total_text_height, (img_width, img_height) = \
+        _layout_text(text, font, font_size, width, height, padding, stats)
+    positions = _line_positions(line_dimensions, img_width, img_height,
+                                total_text_height, horizontal_align,
+                                vertical_align, padding, font_size)
     
-    # 创建临时绘图对象计算文本尺寸
-    temp_draw = ImageDraw.Draw(Image.new("RGB", (1, 1), bg_color))
+    # 预览模式：缩放字体、位置和画布后再光栅化
+    raster_size = font_size
+    if scale != 1.0:
+        raster_size = max(1, round(font_size * scale))
+        with _phase(stats, "load_font"):
+            font = _load_font(font_path, raster_size)
+        positions = [(round(x * scale), round(y * scale)) for x, y in positions]
+        img_width = max(1, round(img_width * scale))
+        img_height = max(1, round(img_height * scale))
     
+    # 创建图片并绘制；双色模式下先画到单通道蒙版上，最后再着色
+    with _phase(stats, "draw"):
+        if parallel and parallel > 1:
+            line_height = _get_glyph_metrics(font).line_height
+            if color_mode == "rgb":
+                img = _render_bands(wrapped_text, positions, line_height, font, font_path,
+                                    raster_size, text_color, bg_color, (img_width, img_height),
+                                    backend, "RGB", parallel, parallel_mode)
+            else:
+                mask = _render_bands(wrapped_text, positions, line_height, font, font_path,
+                                     raster_size, 255, 0, (img_width, img_height),
+                                     backend, "L", parallel, parallel_mode)
+                img = _colorize_mask(mask, text_color, bg_color, color_mode)
+        elif color_mode == "rgb":
+            img = Image.new("RGB", (img_width, img_height), bg_color)
+            _draw_lines(ImageDraw.Draw(img), wrapped_text, positions, font, text_color, backend)
+        else:
+            mask = Image.new("L", (img_width, img_height), 0)
+            _draw_lines(ImageDraw.Draw(mask), wrapped_text, positions, font, 255, backend)
+            img = _colorize_mask(mask, text_color, bg_color, color_mode)
+    
+    if stats is not None:
+        stats.lines = len(wrapped_text)
+        stats.glyphs = sum(len(line) - line.count(" ") for line in wrapped_text)
+        stats.pixels = img_width * img_height
+    return img
+
+
+def _layout_text(text, font, font_size, width, height, padding, stats=None):
+    """
+    排版：换行并计算行尺寸和图片尺寸（不光栅化）
+
+    返回 (换行后的文本行, 每行尺寸, 文本总高度, (图片宽, 图片高))
+    """
     # 文本换行处理
-    wrapped_text = _wrap_text(text, font, width or 800, padding)
+    with _phase(stats, "wrap"):
+        wrapped_text = _wrap_text(text, font, width or 800, padding)
     
-    # 计算文本尺寸
-    line_dimensions = _calculate_text_dimensions(wrapped_text, font, temp_draw)
+    # 计算文本尺寸（基于缓存的字形度量，无需临时画布）
+    with _phase(stats, "measure"):
+        line_dimensions = measure_text_lines(wrapped_text, font)
     total_text_width = max(dim[0] for dim in line_dimensions) if line_dimensions else 0
     total_text_height = sum(dim[1] for dim in line_dimensions) + \
                        (len(line_dimensions) - 1) * (font_size // 4)
     
     # 确定图片尺寸
-    img_width, img_height = width or min(total_text_width + 2 * padding, 800), \
-                           height or (total_text_height + 2 * padding)
-    
-    # 创建图片
-    img = Image.new("RGB", (img_width, img_height), bg_color)
-    draw = ImageDraw.Draw(img)
-    
-    # 计算文字起始位置并绘制
-    _draw_text(draw, wrapped_text, line_dimensions, font, text_color, 
-              img_width, img_height, total_text_height, 
-              horizontal_align, vertical_align, padding, font_size)
-    
-    img.save(output_path)
-    print(f"图片已保存至: {output_path}（分辨率：{img_width}x{img_height}）")
-    return img_width, img_height
+    img_size = (width or min(total_text_width + 2 * padding, 800),
+                height or (total_text_height + 2 * padding))
+    return wrapped_text, line_dimensions, total_text_height, img_size
+
+
+def fit_font_size(text, font_path, width, height, padding=20, min_size=8, max_size=200):
+    """
+    二分查找能让文字完整放入 width x height 画布的最大字号
+
+    每一步只做排版（换行和测量），不光栅化也不编码；各字号的字体进入字体缓存，
+    字形度量也按字体对象缓存。
+
+    参数:
+        text: 要渲染的文字
+        font_path: 字体文件路径（或字体回退链）
+        width: 图片宽度
+        height: 图片高度
+        padding: 文字与图片边缘的间距
+        min_size: 最小字号，连最小字号都放不下时返回该字号
+        max_size: 最大字号
+
+    返回 (字号, 排版次数)
+    """
+    if min_size < 1 or max_size < min_size:
+        raise ValueError(f"字号范围无效: {min_size}-{max_size}")
+    available = (width - 2 * padding, height - 2 * padding)
+
+    def fits(font_size):
+        font = _load_font(font_path, font_size)
+        _, line_dimensions, total_text_height, _ = \
+            _layout_text(text, font, font_size, width, height, padding)
+        text_width = max(dim[0] for dim in line_dimensions)
+        return text_width <= available[0] and total_text_height <= available[1]
+
+    # 不变量：low 可以放下（或为最小字号），high 之上都放不下
+    low, high = min_size, max_size
+    iterations = 0
+    while low < high:
+        mid = (low + high + 1) // 2
+        iterations += 1
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low, iterations
+
+
+def encode(img, format="PNG", stats=None, **opts):
+    """
+    将图片编码为字节串（写入内存中的BytesIO，不经过磁盘）
+
+    参数:
+        img: PIL.Image 对象
+        format: 图片格式（PNG/JPEG/WEBP/PPM...），RAW 表示原始像素字节
+        stats: 可选的 RenderStats 对象，记录编码耗时和字节数
+        opts: 透传给 Image.save 的编码参数
+    """
+    with _phase(stats, "encode"):
+        if format.upper() == "RAW":
+            data = img.tobytes()
+        else:
+            buffer = BytesIO()
+            img.save(buffer, format=format, **opts)
+            data = buffer.getvalue()
+    if stats is not None:
+        stats.encoded_bytes = len(data)
+    return data
+
+
+class RenderStats:
+    """
+    单次渲染的分阶段统计
 
+    timings 记录各阶段（load_font/wrap/measure/draw/encode）的耗时（秒），
+    另外记录字形数、行数、像素数和编码后的字节数。
+    """
+
+    PHASES = ("load_font", "wrap", "measure", "draw", "encode")
+
+    def __init__(self):
+        self.timings = {}
+        self.glyphs = 0
+        self.lines = 0
+        self.pixels = 0
+        self.encoded_bytes = 0
+
+    @contextmanager
+    def phase(self, name):
+        """计时上下文，同一阶段多次进入时累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        total = sum(self.timings.values())
+        return {
+            "timings": {name: self.timings.get(name, 0.0) for name in self.PHASES},
+            "total": total,
+            "glyphs": self.glyphs,
+            "lines": self.lines,
+            "pixels": self.pixels,
+            "encoded_bytes": self.encoded_bytes,
+        }
+
+
+def _phase(stats, name):
+    """stats 为 None 时不计时"""
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def summarize_stats(stats_list):
+    """
+    汇总多次渲染的统计（RenderStats 或其 as_dict() 结果），
+    返回每个阶段耗时及总耗时的 count/mean/p50/p90/p99
+    """
+    records = [s.as_dict() if isinstance(s, RenderStats) else s for s in stats_list]
+    series = {name: [r["timings"].get(name, 0.0) for r in records]
+              for name in RenderStats.PHASES}
+    series["total"] = [r["total"] for r in records]
+    return {name: _percentiles(values) for name, values in series.items()}
+
+
+def _percentiles(values):
+    """计算 count/mean/p50/p90/p99（最近秩法）"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+    count = len(ordered)
+
+    def rank(q):
+        return ordered[min(max(math.ceil(q * count) - 1, 0), count - 1)]
+
+    return {"count": count, "mean": sum(ordered) / count,
+            "p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99)}
+
+
+def iter_text_pages(
+    text,
+    font_path,
+    font_size=40,
+    text_color=(0, 0, 0),
+    bg_color=(255, 255, 255),
+    width=None,
+    page_height=None,
+    lines_per_page=None,
+    horizontal_align="center",
+    vertical_align="top",
+    padding=20,
+    backend="draw",
+    color_mode="rgb",
+):
+    """
+    分页渲染：逐页生成 PIL.Image，内存峰值只与单页大小有关
+
+    参数与 render_text_image 相同，另外:
+        page_height: 每页高度（像素），每页能容纳的行数由此推算
+        lines_per_page: 每页行数，同时指定时优先于 page_height 推算的行数
+        color_mode: 颜色模式（见 render_text_image）
+    未指定 page_height 时，每页高度按该页实际行数计算。
+    """
+    if page_height is None and lines_per_page is None:
+        raise ValueError("分页模式需要指定 page_height 或 lines_per_page")
+
+    font = _load_font(font_path, font_size)
+    metrics = _get_glyph_metrics(font)
+    line_spacing = font_size // 4
+    img_width = width or 800
+    available = max(img_width - 2 * padding, 1)
+
+    if lines_per_page is None:
+        usable = page_height - 2 * padding + line_spacing
+        lines_per_page = usable // (metrics.line_height + line_spacing)
+    lines_per_page = max(int(lines_per_page), 1)
+
+    def render_page(lines):
+        line_dimensions = measure_text_lines(lines, font)
+        total_text_height = sum(dim[1] for dim in line_dimensions) + \
+                           (len(line_dimensions) - 1) * line_spacing
+        img_height = page_height or (total_text_height + 2 * padding)
+        positions = _line_positions(line_dimensions, img_width, img_height,
+                                    total_text_height, horizontal_align,
+                                    vertical_align, padding, font_size)
+        if color_mode == "rgb":
+            img = Image.new("RGB", (img_width, img_height), bg_color)
+            _draw_lines(ImageDraw.Draw(img), lines, positions, font, text_color, backend)
+            return img
+        mask = Image.new("L", (img_width, img_height), 0)
+        _draw_lines(ImageDraw.Draw(mask), lines, positions, font, 255, backend)
+        return _colorize_mask(mask, text_color, bg_color, color_mode)
+
+    # 逐段换行、凑满一页即输出，不保留已输出页的行
+    page = []
+    for paragraph in _iter_paragraphs(text):
+        for line in _break_paragraph(paragraph, metrics.widths(paragraph), available):
+            page.append(line)
+            if len(page) == lines_per_page:
+                yield render_page(page)
+                page = []
+    if page:
+        yield render_page(page)
+
+
+def _iter_paragraphs(text):
+    """按换行符逐段产出文本，不一次性切分整篇文本"""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def create_text_pages(text, font_path, output_path, format=None, encode_opts=None,
+                      **kwargs):
+    """
+    分页渲染并逐页保存，文件名为 output_0001.png、output_0002.png ...
+
+    format/encode_opts/color_mode 与 create_text_image 相同，其余参数与 iter_text_pages 相同，
+    返回已保存的文件路径列表
+    """
+    stem, ext = os.path.splitext(output_path)
+    format = _output_format(output_path, format)
+    kwargs["color_mode"] = _resolve_color_mode(kwargs.get("color_mode", "auto"), format)
+    paths = []
+    for number, img in enumerate(iter_text_pages(text, font_path, **kwargs), 1):
+        path = f"{stem}_{number:04d}{ext or '.png'}"
+        _save_image(img, path, format, encode_opts)
+        paths.append(path)
+    print(f"已分页保存 {len(paths)} 张图片: {stem}_0001{ext or '.png'} ...")
+    return paths
+
+
+def _load_font(font_path, font_size, index=0):
+    """
+    加载字体，处理异常情况（结果进入进程级LRU缓存）
 
-def _load_font(font_path, font_size):
-    """加载字体，处理异常情况"""
+    font_path 为多个路径组成的列表时返回按顺序回退的 FontChain
+    """
+    if isinstance(font_path, (list, tuple)):
+        if len(font_path) > 1:
+            return _load_font_chain(font_path, font_size)
+        font_path = font_path[0] if font_path else ""
     try:
         if font_path and len(font_path) > 0:
-            return ImageFont.truetype(font_path, font_size)
+            return _get_cached_font(font_path, font_size, index)
     except (IOError, OSError):
-        print(f"无法加载字体文件: {font_path}")
-    return ImageFont.load_default()
+        # 诊断信息写到标准错误（标准输出可能是图片数据），同一路径只提示一次
+        if font_path not in _FONT_WARNINGS:
+            _FONT_WARNINGS.add(font_path)
+            print(f"无法加载字体文件: {font_path}", file=sys.stderr)
+    return _load_default_font(font_size)
+
+
+def _load_default_font(font_size):
+    """加载Pillow内置字体（同样进入字体缓存），与原来一样使用其默认字号，忽略 font_size"""
+    key = (None,)
+    with _FONT_CACHE_LOCK:
+        font = _FONT_CACHE.get(key)
+        if font is not None:
+            _FONT_CACHE.move_to_end(key)
+            return font
+        font = ImageFont.load_default()
+        _FONT_CACHE[key] = font
+        _FONT_CACHE_STATS["evictions"] += _evict(_FONT_CACHE, _FONT_CACHE_MAX)
+        return font
+
+
+def _get_cached_font(font_path, font_size, index=0):
+    """从缓存中取出字体，未命中时按当前加载方式（见 FONT_LOAD_MODES）加载"""
+    resolved = os.path.realpath(font_path)
+    st = os.stat(resolved)
+    file_key = (resolved, st.st_mtime_ns, st.st_size)
+    key = file_key + (index, font_size)
+
+    with _FONT_CACHE_LOCK:
+        font = _FONT_CACHE.get(key)
+        if font is not None:
+            _FONT_CACHE.move_to_end(key)
+            _FONT_CACHE_STATS["hits"] += 1
+            return font
+        _FONT_CACHE_STATS["misses"] += 1
+
+        if _FONT_LOAD_MODE == "mmap":
+            font = ImageFont.truetype(resolved, font_size, index=index)
+        else:
+            data = _FONT_DATA_CACHE.get(file_key)
+            if data is None:
+                with open(resolved, "rb") as f:
+                    data = _FONT_DATA_CACHE[file_key] = f.read()
+                _evict(_FONT_DATA_CACHE, _FONT_CACHE_MAX)
+            else:
+                _FONT_DATA_CACHE.move_to_end(file_key)
+            font = ImageFont.truetype(BytesIO(data), font_size, index=index)
+        _FONT_CACHE[key] = font
+        _FONT_CACHE_STATS["evictions"] += _evict(_FONT_CACHE, _FONT_CACHE_MAX)
+        return font
+
+
+def _evict(cache, max_entries):
+    """按LRU顺序淘汰超出容量的条目，返回淘汰数量"""
+    evicted = 0
+    while len(cache) > max(max_entries, 0):
+        cache.popitem(last=False)
+        evicted += 1
+    return evicted
+
+
+def font_cache_info():
+    """返回字体缓存的命中/未命中/淘汰计数及当前容量"""
+    with _FONT_CACHE_LOCK:
+        info = dict(_FONT_CACHE_STATS)
+        info["size"] = len(_FONT_CACHE)
+        info["max_size"] = _FONT_CACHE_MAX
+        info["load_mode"] = _FONT_LOAD_MODE
+        return info
+
+
+def set_font_load_mode(mode):
+    """
+    设置字体加载方式（"mmap" 或 "memory"，见 FONT_LOAD_MODES 的说明）
+
+    只影响之后新加载的字体，因此会清空字体缓存；多进程渲染时应在创建
+    工作进程之前（或在工作进程初始化时）调用
+    """
+    global _FONT_LOAD_MODE
+    if mode not in FONT_LOAD_MODES:
+        raise ValueError(f"未知的字体加载方式: {mode}")
+    with _FONT_CACHE_LOCK:
+        _FONT_LOAD_MODE = mode
+    clear_font_cache()
+
+
+def process_memory():
+    """
+    返回当前进程的内存占用 {"rss": 字节, "pss": 字节}
+
+    RSS 来自 /proc/self/status 的 VmRSS；PSS 来自 /proc/self/smaps_rollup，
+    多个进程共享的页（如映射的字体文件）按共享进程数均摊，因此各工作进程的
+    PSS 之和才是真实占用。非Linux系统返回 None
+    """
+    usage = {}
+    for path, field, name in (("/proc/self/status", "VmRSS:", "rss"),
+                              ("/proc/self/smaps_rollup", "Pss:", "pss")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        usage[name] = int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return usage or None
+
+
+def set_font_cache_size(max_entries):
+    """设置字体缓存容量（字体对象个数），多余的条目立即淘汰"""
+    global _FONT_CACHE_MAX
+    with _FONT_CACHE_LOCK:
+        _FONT_CACHE_MAX = max(int(max_entries), 0)
+        _FONT_CACHE_STATS["evictions"] += _evict(_FONT_CACHE, _FONT_CACHE_MAX)
+        _evict(_FONT_DATA_CACHE, _FONT_CACHE_MAX)
+
+
+def clear_font_cache():
+    """清空字体缓存并重置计数"""
+    with _FONT_CACHE_LOCK:
+        _FONT_CACHE.clear()
+        _FONT_DATA_CACHE.clear()
+        for name in _FONT_CACHE_STATS:
+            _FONT_CACHE_STATS[name] = 0
+
+
+def _load_font_chain(font_paths, font_size):
+    """加载字体回退链，链对象本身也进入字体缓存以复用其字形度量"""
+    fonts, paths = [], []
+    for font_path in font_paths:
+        font = _load_font(font_path, font_size)
+        if font not in fonts:
+            fonts.append(font)
+            paths.append(font_path)
+    key = ("chain", tuple(fonts))
+    with _FONT_CACHE_LOCK:
+        chain = _FONT_CACHE.get(key)
+        if chain is not None:
+            _FONT_CACHE.move_to_end(key)
+            return chain
+        coverages = [_get_coverage(path, font) for path, font in zip(paths, fonts)]
+        chain = FontChain(fonts, coverages)
+        _FONT_CACHE[key] = chain
+        _FONT_CACHE_STATS["evictions"] += _evict(_FONT_CACHE, _FONT_CACHE_MAX)
+        return chain
+
+
+class FontChain:
+    """
+    字体回退链：每个字符使用链中第一个包含该字形的字体
+
+    提供与单个字体相同的 getlength/getmetrics 接口，因此换行、测量阶段无需
+    区分单字体和字体链；绘制阶段按字体切分为多个文字段并对齐基线。
+    """
+
+    def __init__(self, fonts, coverages):
+        self.fonts = fonts
+        self.coverages = coverages
+        self.size = fonts[0].size
+        self._choice = {}
+        metrics = [_font_vertical_metrics(font) for font in fonts]
+        self.ascent = max(ascent for ascent, _ in metrics)
+        self.descent = max(descent for _, descent in metrics)
+
+    def font_for(self, char):
+        """返回负责渲染该字符的字体（都不包含时使用首选字体，显示为缺字方框）"""
+        font = self._choice.get(char)
+        if font is None:
+            code = ord(char)
+            font = self.fonts[0]
+            for candidate, coverage in zip(self.fonts, self.coverages):
+                if coverage is None or coverage[code >> 3] & (1 << (code & 7)):
+                    font = candidate
+                    break
+            self._choice[char] = font
+        return font
+
+    def runs(self, text):
+        """将文本切分为 (字体, 文字段) 列表，相邻同字体的字符合并为一段"""
+        runs = []
+        for char in text:
+            font = self.font_for(char)
+            if runs and runs[-1][0] is font:
+                runs[-1][1].append(char)
+            else:
+                runs.append((font, [char]))
+        return [(font, "".join(chars)) for font, chars in runs]
+
+    def getlength(self, text):
+        return sum(font.getlength(run) for font, run in self.runs(text))
+
+    def getmetrics(self):
+        return self.ascent, self.descent
+
+    def getbbox(self, text):
+        return (0, 0, math.ceil(self.getlength(text)), self.ascent + self.descent)
+
+    def draw_line(self, draw, xy, line, fill, backend="draw"):
+        """逐段绘制一行文字，各字体的基线对齐到链的公共基线"""
+        x, y = xy
+        metrics = _get_glyph_metrics(self)
+        baseline = y + self.ascent
+        pen = 0.0
+        for font, run in self.runs(line):
+            top = baseline - _get_glyph_metrics(font).ascent
+            if backend == "atlas":
+                _get_glyph_atlas(font).draw_line(draw, (x + round(pen), top), run, fill)
+            else:
+                draw.text((x + round(pen), top), run, font=font, fill=fill)
+            pen += sum(metrics.widths(run))
+
+
+# 字形覆盖索引：每个字体一个 0x110000 位的位图，按码位 O(1) 查询
+_COVERAGE_CACHE = {}
+
+
+def _coverage_cache_dir():
+    """覆盖索引的磁盘缓存目录"""
+    return os.environ.get("TEXT_TO_IMAGE_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "text_to_image", "coverage"
+    )
+
+
+def _get_coverage(font_path, font):
+    """
+    获取字体的字形覆盖位图；区间表按 (路径, 修改时间, 文件大小) 缓存在磁盘上，
+    无法解析的字体（如内置字体）返回 None，表示视为覆盖所有字符
+    """
+    if not font_path:
+        return None
+    try:
+        resolved = os.path.realpath(font_path)
+        st = os.stat(resolved)
+    except (OSError, TypeError, ValueError):
+        return None
+    file_key = (resolved, st.st_mtime_ns, st.st_size, getattr(font, "index", 0))
+    coverage = _COVERAGE_CACHE.get(file_key)
+    if coverage is not None:
+        return coverage
+
+    name = hashlib.sha1(repr(file_key).encode("utf-8")).hexdigest() + ".json"
+    cache_path = os.path.join(_coverage_cache_dir(), name)
+    ranges = None
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            ranges = json.load(f)["ranges"]
+    except (OSError, ValueError, KeyError):
+        pass
+    if ranges is None:
+        try:
+            with open(resolved, "rb") as f:
+                ranges = _read_cmap_ranges(f.read(), file_key[3])
+        except (OSError, ValueError, struct.error):
+            return None
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump({"path": resolved, "ranges": ranges}, f)
+        except OSError:
+            # 缓存目录不可写时只在内存中保留
+            pass
+
+    coverage = bytearray(0x110000 >> 3)
+    for start, end in ranges:
+        for code in range(start, min(end, 0x10FFFF) + 1):
+            coverage[code >> 3] |= 1 << (code & 7)
+    _COVERAGE_CACHE[file_key] = coverage
+    return coverage
+
+
+def _read_cmap_ranges(data, index=0):
+    """解析TrueType/OpenType（含TTC）的 cmap 表，返回有字形的码位区间列表"""
+    offset = 0
+    if data[:4] == b"ttcf":
+        num_fonts = struct.unpack_from(">I", data, 8)[0]
+        if index >= num_fonts:
+            raise ValueError(f"字体集合中没有第{index}个字体")
+        offset = struct.unpack_from(">I", data, 12 + 4 * index)[0]
+    num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+    cmap = None
+    for i in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+        if tag == b"cmap":
+            cmap = table_offset
+    if cmap is None:
+        raise ValueError("字体中没有 cmap 表")
+
+    # 按优先级选择子表：完整Unicode（格式12）优先，其次BMP（格式4）
+    subtables = {}
+    for i in range(struct.unpack_from(">H", data, cmap + 2)[0]):
+        platform_id, encoding_id, sub_offset = struct.unpack_from(">HHI", data, cmap + 4 + 8 * i)
+        sub = cmap + sub_offset
+        subtables[(platform_id, encoding_id, struct.unpack_from(">H", data, sub)[0])] = sub
+    for key in ((3, 10, 12), (0, 6, 12), (0, 4, 12), (3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)):
+        if key in subtables:
+            sub = subtables[key]
+            ranges = _cmap_format12(data, sub) if key[2] == 12 else _cmap_format4(data, sub)
+            return _merge_ranges(ranges)
+    raise ValueError("字体中没有受支持的Unicode cmap 子表")
+
+
+def _cmap_format4(data, sub):
+    """解析格式4（分段映射，BMP）"""
+    seg_count = struct.unpack_from(">H", data, sub + 6)[0] // 2
+    ends = struct.unpack_from(f">{seg_count}H", data, sub + 14)
+    starts = struct.unpack_from(f">{seg_count}H", data, sub + 16 + 2 * seg_count)
+    deltas = struct.unpack_from(f">{seg_count}h", data, sub + 16 + 4 * seg_count)
+    range_offsets_at = sub + 16 + 6 * seg_count
+    range_offsets = struct.unpack_from(f">{seg_count}H", data, range_offsets_at)
+    ranges = []
+    for i in range(seg_count):
+        start, end = starts[i], ends[i]
+        if start == 0xFFFF:
+            continue
+        if range_offsets[i] == 0:
+            # 字形号 = (码位 + delta) mod 65536，只排除映射到字形0的那个码位
+            missing = (-deltas[i]) & 0xFFFF
+            if start <= missing <= end:
+                ranges += [(start, missing - 1), (missing + 1, end)]
+            else:
+                ranges.append((start, end))
+            continue
+        base = range_offsets_at + 2 * i + range_offsets[i]
+        for code in range(start, end + 1):
+            glyph_at = base + 2 * (code - start)
+            if glyph_at + 2 <= len(data) and struct.unpack_from(">H", data, glyph_at)[0]:
+                ranges.append((code, code))
+    return ranges
+
+
+def _cmap_format12(data, sub):
+    """解析格式12（分段覆盖，完整Unicode）"""
+    num_groups = struct.unpack_from(">I", data, sub + 12)[0]
+    ranges = []
+    for i in range(num_groups):
+        start, end, glyph = struct.unpack_from(">III", data, sub + 16 + 12 * i)
+        if glyph == 0:
+            start += 1
+        ranges.append((start, end))
+    return ranges
+
+
+def _merge_ranges(ranges):
+    """合并重叠或相邻的区间"""
+    merged = []
+    for start, end in sorted(r for r in ranges if r[0] <= r[1]):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class TextLayout:
+    """
+    可增量更新的排版对象，适用于GUI等交互式调用方
+
+    按段落缓存换行结果和行尺寸（键为段落内容，样式变化时整体失效）。
+    每次 render 只重新排版发生变化的段落，并且只重绘内容或位置发生变化的
+    行所在的水平条带；输出与 render_text_image 相同参数的结果逐像素一致。
+
+    参数与 render_text_image 相同（没有 text）
+    """
+
+    # 影响换行和行尺寸的参数；其余参数只影响绘制
+    _LAYOUT_KEYS = ("font_path", "font_size", "width", "padding")
+
+    def __init__(self, font_path, font_size=40, text_color=(0, 0, 0),
+                 bg_color=(255, 255, 255), width=None, height=None,
+                 horizontal_align="center", vertical_align="center",
+                 padding=20, backend="draw", scale=1.0):
+        self.style = {}
+        self._paragraphs = {}
+        self._image = None
+        self._drawn = []
+        # 最近一次 render 重绘的条带 (top, bottom)，None 表示没有重绘
+        self.dirty_band = None
+        self.set_style(font_path=font_path, font_size=font_size,
+                       text_color=text_color, bg_color=bg_color, width=width,
+                       height=height, horizontal_align=horizontal_align,
+                       vertical_align=vertical_align, padding=padding,
+                       backend=backend, scale=scale)
+
+    def set_style(self, **style):
+        """更新样式；影响排版的参数变化时清空段落缓存，任何变化都会触发整图重绘"""
+        changed = {k for k, v in style.items() if self.style.get(k, object()) != v}
+        if not changed:
+            return
+        self.style.update(style)
+        if changed.intersection(self._LAYOUT_KEYS):
+            self._paragraphs.clear()
+        self._image = None
+
+    def layout(self, text):
+        """
+        排版（不光栅化），只对缓存中没有的段落重新换行和测量
+
+        返回 (文本行, 每行尺寸, 文本总高度, (图片宽, 图片高))
+        """
+        style = self.style
+        font = _load_font(style["font_path"], style["font_size"])
+        metrics = _get_glyph_metrics(font)
+        available = max((style["width"] or 800) - 2 * style["padding"], 1)
+
+        cache = {}
+        lines, line_dimensions = [], []
+        for paragraph in text.split("\n"):
+            entry = cache.get(paragraph) or self._paragraphs.get(paragraph)
+            if entry is None:
+                wrapped = _break_paragraph(paragraph, metrics.widths(paragraph), available)
+                entry = (wrapped, measure_text_lines(wrapped, font))
+            cache[paragraph] = entry
+            lines.extend(entry[0])
+            line_dimensions.extend(entry[1])
+        # 只保留当前文本中仍存在的段落，缓存大小与文档规模一致
+        self._paragraphs = cache
+
+        width, height, padding = style["width"], style["height"], style["padding"]
+        total_text_width = max(dim[0] for dim in line_dimensions) if line_dimensions else 0
+        total_text_height = sum(dim[1] for dim in line_dimensions) + \
+                           (len(line_dimensions) - 1) * (style["font_size"] // 4)
+        img_size = (width or min(total_text_width + 2 * padding, 800),
+                    height or (total_text_height + 2 * padding))
+        return lines, line_dimensions, total_text_height, img_size
+
+    def render(self, text):
+        """
+        渲染文本并返回图片；图片对象在后续 render 中会被原地更新，
+        需要长期持有时请自行 copy()
+        """
+        style = self.style
+        scale = style["scale"]
+        lines, line_dimensions, total_text_height, (img_width, img_height) = self.layout(text)
+        positions = _line_positions(line_dimensions, img_width, img_height,
+                                    total_text_height, style["horizontal_align"],
+                                    style["vertical_align"], style["padding"],
+                                    style["font_size"])
+        font = _load_font(style["font_path"], style["font_size"])
+        line_height = line_dimensions[0][1] if line_dimensions else 0
+        if scale != 1.0:
+            font = _load_font(style["font_path"], max(1, round(style["font_size"] * scale)))
+            positions = [(round(x * scale), round(y * scale)) for x, y in positions]
+            img_width = max(1, round(img_width * scale))
+            img_height = max(1, round(img_height * scale))
+            line_height = _get_glyph_metrics(font).line_height
+        drawn = list(zip(lines, positions))
+
+        if self._image is None or self._image.size != (img_width, img_height):
+            # 首次渲染或画布尺寸变化：整图重绘
+            self._image = Image.new("RGB", (img_width, img_height), style["bg_color"])
+            _draw_lines(ImageDraw.Draw(self._image), lines, positions, font,
+                        style["text_color"], style["backend"])
+            self._drawn = drawn
+            self.dirty_band = (0, img_height)
+            return self._image
+
+        # 找出新增或消失（内容或位置变化）的行，合并为一个需要重绘的条带
+        old, new = set(self._drawn), set(drawn)
+        changed = (old - new) | (new - old)
+        self._drawn = drawn
+        if not changed:
+            self.dirty_band = None
+            return self._image
+        top = max(min(y for _, (_, y) in changed), 0)
+        bottom = min(max(y for _, (_, y) in changed) + line_height, img_height)
+        band = _render_band(lines, positions, line_height, font, style["text_color"],
+                            style["bg_color"], img_width, top, bottom, style["backend"])
+        self._image.paste(band, (0, top))
+        self.dirty_band = (top, bottom)
+        return self._image
 
 
 def _wrap_text(text, font, max_width, padding):
-    """处理文本换行"""
-    # 计算平均字符宽度用于换行
-    bbox = font.getbbox("x")
-    avg_char_width = bbox[2] - bbox[0]
-    max_chars_per_line = (max_width - 2 * padding) // avg_char_width
-    
+    """处理文本换行（按字形实际宽度断行，支持中日韩文字逐字断行）"""
+    available = max(max_width - 2 * padding, 1)
+    metrics = _get_glyph_metrics(font)
+
     wrapped_text = []
     for paragraph in text.split("\n"):
-        wrapped = textwrap.fill(paragraph, width=max_chars_per_line)
-        wrapped_text.extend(wrapped.split("\n"))
-    
+        wrapped_text.extend(_break_paragraph(paragraph, metrics.widths(paragraph), available))
     return wrapped_text
 
 
-def _calculate_text_dimensions(wrapped_text, font, draw):
-    """计算每行文本的宽度和高度"""
-    line_dimensions = []
-    for line in wrapped_text:
-        bbox = draw.textbbox((0, 0), line, font=font)
-        line_dimensions.append((bbox[2] - bbox[0], bbox[3] - bbox[1]))
-    return line_dimensions
+# 不能出现在行首的标点（避头）和不能出现在行尾的标点（避尾）
+_NO_LINE_START = set("，。、；：！？）》」』】〕〉”’…—,.;:!?)]}%")
+_NO_LINE_END = set("（《「『【〔〈“‘([{")
+
+# 中日韩文字的Unicode区间，区间内字符之间可以直接断行
+_CJK_RANGES = (
+    (0x1100, 0x11FF),
+    (0x2E80, 0x9FFF),
+    (0xA960, 0xA97F),
+    (0xAC00, 0xD7AF),
+    (0xF900, 0xFAFF),
+    (0xFE30, 0xFE4F),
+    (0xFF00, 0xFFEF),
+    (0x20000, 0x3FFFF),
+)
+
+
+def _is_cjk(char):
+    """判断字符是否属于中日韩文字"""
+    code = ord(char)
+    for low, high in _CJK_RANGES:
+        if code < low:
+            return False
+        if code <= high:
+            return True
+    return False
+
+
+def _can_break(paragraph, pos):
+    """判断能否在 paragraph[pos] 之前断行"""
+    before, after = paragraph[pos - 1], paragraph[pos]
+    if after.isspace() or before.isspace():
+        return True
+    if after in _NO_LINE_START or before in _NO_LINE_END:
+        return False
+    if _is_cjk(before) or _is_cjk(after):
+        return True
+    return before == "-"
+
+
+def _break_paragraph(paragraph, widths, available):
+    """
+    将一个段落按可用宽度断成多行
+
+    widths 为每个字符的前进宽度；利用前缀和二分查找每行最多能容纳的位置，
+    再向前回退到最近的合法断点（拉丁文单词边界、中日韩字符之间）。
+    """
+    return [paragraph[start:end] for start, end in _break_spans(paragraph, widths, available)]
+
+
+def _break_spans(paragraph, widths, available):
+    """与 _break_paragraph 相同，但返回每行在段落中的 (起点, 终点) 下标（不含行尾空白）"""
+    if not paragraph:
+        return [(0, 0)]
+
+    cumulative = list(accumulate(widths, initial=0))
+    length = len(paragraph)
+    lines = []
+    start = 0
+    while start < length:
+        # 二分查找：满足 cumulative[end] - cumulative[start] <= available 的最大 end
+        end = bisect_right(cumulative, cumulative[start] + available, start + 1) - 1
+        if end >= length:
+            lines.append(_strip_end(paragraph, start, length))
+            break
+        # 行尾空格允许悬挂在可用宽度之外
+        if paragraph[end].isspace():
+            pos = end
+        else:
+            pos = end
+            while pos > start and not _can_break(paragraph, pos):
+                pos -= 1
+            if pos <= start:
+                # 没有合法断点（超长单词），强制在可用宽度处断开，且每行至少一个字符
+                pos = max(end, start + 1)
+        lines.append(_strip_end(paragraph, start, pos))
+        start = pos
+        while start < length and paragraph[start].isspace():
+            start += 1
+    return lines or [(0, 0)]
+
+
+def _strip_end(paragraph, start, end):
+    """去掉 paragraph[start:end] 的行尾空白，返回 (起点, 终点)"""
+    while end > start and paragraph[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class _GlyphMetrics:
+    """单个字体（含字号）的字形度量缓存：每个字符的前进宽度只测量一次"""
+
+    def __init__(self, font):
+        self.font = font
+        self.advances = {}
+        self.kernings = {}
+        self.ascent, self.descent = _font_vertical_metrics(font)
+        self.line_height = self.ascent + self.descent
+
+    def advance(self, char):
+        width = self.advances.get(char)
+        if width is None:
+            width = self.advances[char] = self.font.getlength(char)
+        return width
+
+    def widths(self, text):
+        """返回 text 中每个字符的前进宽度列表"""
+        advances = self.advances
+        missing = set(text).difference(advances)
+        for char in missing:
+            advances[char] = self.font.getlength(char)
+        return [advances[char] for char in text]
+
+    def kerning(self, pair):
+        """两个相邻字符之间的字距调整量（FreeType 的 26.6 定点值，可为负）"""
+        kern = self.kernings.get(pair)
+        if kern is None:
+            kern = self.kernings[pair] = \
+                self.font.getlength(pair) - self.advance(pair[0]) - self.advance(pair[1])
+        return kern
+
+
+def _font_vertical_metrics(font):
+    """返回字体的 (ascent, descent)，位图字体没有 getmetrics 时用字形包围盒估算"""
+    try:
+        return font.getmetrics()
+    except AttributeError:
+        bbox = font.getbbox("Ag")
+        return bbox[3], 0
+
+
+# 按字体对象缓存字形度量；字体对象由字体缓存复用，因此度量也随之复用
+_GLYPH_METRICS = weakref.WeakKeyDictionary()
+
+
+def _get_glyph_metrics(font):
+    """获取字体对应的字形度量缓存"""
+    with _FONT_CACHE_LOCK:
+        metrics = _GLYPH_METRICS.get(font)
+        if metrics is None:
+            metrics = _GLYPH_METRICS[font] = _GlyphMetrics(font)
+        return metrics
+
+
+def measure_text_lines(lines, font):
+    """
+    一次性计算多行文本的宽度和高度
+
+    宽度为各字符前进宽度之和（来自缓存的字形度量），高度统一为字体的
+    ascent + descent，与 draw.text 默认的左上（ascender）锚点一致。
+    换行、自动字号和绘制阶段共用这一度量结果。
+    """
+    metrics = _get_glyph_metrics(font)
+    line_height = metrics.line_height
+    return [(math.ceil(sum(metrics.widths(line))), line_height) for line in lines]
+
+
+def _calculate_text_dimensions(wrapped_text, font, draw=None):
+    """计算每行文本的宽度和高度（draw 参数仅为兼容旧调用保留）"""
+    return measure_text_lines(wrapped_text, font)
 
 
 def _draw_text(draw, wrapped_text, line_dimensions, font, text_color,
                img_width, img_height, total_text_height,
-               horizontal_align, vertical_align, padding, font_size):
+               horizontal_align, vertical_align, padding, font_size,
+               backend="draw"):
     """绘制文本到图片上"""
+    positions = _line_positions(line_dimensions, img_width, img_height,
+                                total_text_height, horizontal_align,
+                                vertical_align, padding, font_size)
+    _draw_lines(draw, wrapped_text, positions, font, text_color, backend)
+
+
+def _line_positions(line_dimensions, img_width, img_height, total_text_height,
+                    horizontal_align, vertical_align, padding, font_size):
+    """根据对齐方式计算每行文字的左上角坐标"""
     # 计算垂直起始位置
     if vertical_align == "top":
         y_text = padding
@@ -118,11 +1270,9 @@ def _draw_text(draw, wrapped_text, line_dimensions, font, text_color,
     else:  # bottom
         y_text = img_height - padding - total_text_height
     
-    # 绘制每行文字
     line_spacing = font_size // 4
-    for i, line in enumerate(wrapped_text):
-        line_width = line_dimensions[i][0]
-        
+    positions = []
+    for line_width, line_height in line_dimensions:
         # 计算水平起始位置
         if horizontal_align == "left":
             x_text = padding
@@ -131,20 +1281,217 @@ def _draw_text(draw, wrapped_text, line_dimensions, font, text_color,
         else:  # right
             x_text = img_width - padding - line_width
         
-        draw.text((x_text, y_text), line, font=font, fill=text_color)
-        y_text += line_dimensions[i][1] + line_spacing
+        positions.append((x_text, y_text))
+        y_text += line_height + line_spacing
+    return positions
+
+
+def _render_band(lines, positions, line_height, font, text_color, bg_color,
+                 img_width, top, bottom, backend="draw"):
+    """
+    渲染图片中 [top, bottom) 的水平条带
+
+    与条带相交的行（含一个行高的余量，覆盖超出行框的笔画）按原顺序绘制，
+    因此条带内像素与整图渲染完全相同。
+    """
+    band = Image.new("RGB", (img_width, max(bottom - top, 1)), bg_color)
+    band_lines, band_positions = [], []
+    for line, (x, y) in zip(lines, positions):
+        if y - line_height < bottom and y + 2 * line_height > top:
+            band_lines.append(line)
+            band_positions.append((x, y - top))
+    _draw_lines(ImageDraw.Draw(band), band_lines, band_positions, font, text_color, backend)
+    return band
+
+
+PARALLEL_MODES = ("process", "thread")
+# 每个工作者分到的条带数，多切几条让行数不均的条带之间负载更平衡
+_BANDS_PER_WORKER = 2
+
+
+def _render_bands(lines, positions, line_height, font, font_path, font_size,
+                  text_color, bg_color, img_size, backend, mode, workers, parallel_mode):
+    """
+    将整图切成水平条带并发光栅化，再按顺序拼接到预先分配的画布上
+
+    每个条带都用 _render_band 绘制，因此拼接结果与串行渲染逐字节相同。
+    进程模式下由工作进程按 (字体路径, 字号) 从自身的字体缓存加载字体；
+    线程模式下各线程共用同一个字体对象：Pillow 调用 FreeType 时不释放 GIL，
+    对同一字体的调用本来就是串行的。
+    """
+    if parallel_mode not in PARALLEL_MODES:
+        raise ValueError(f"未知的并行方式: {parallel_mode}")
+    img_width, img_height = img_size
+    count = min(workers * _BANDS_PER_WORKER, max(img_height // max(line_height, 1), 1))
+    edges = [img_height * i // count for i in range(count + 1)]
+    jobs = []
+    for top, bottom in zip(edges, edges[1:]):
+        band_lines, band_positions = [], []
+        for line, (x, y) in zip(lines, positions):
+            if y - line_height < bottom and y + 2 * line_height > top:
+                band_lines.append(line)
+                band_positions.append((x, y))
+        jobs.append((band_lines, band_positions, line_height, text_color, bg_color,
+                     img_width, top, bottom, backend, mode))
+
+    canvas = Image.new(mode, img_size, bg_color)
+    if parallel_mode == "process":
+        from concurrent.futures import ProcessPoolExecutor
 
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render_band_job, font_path, font_size, *job) for job in jobs]
+            for (*_, top, _, _, _), future in zip(jobs, futures):
+                canvas.paste(future.result(), (0, top))
+        return canvas
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job, band in zip(jobs, pool.map(lambda job: _render_band_with(font, *job), jobs)):
+            canvas.paste(band, (0, job[6]))
+    return canvas
+
+
+def _render_band_with(font, lines, positions, line_height, text_color, bg_color,
+                      img_width, top, bottom, backend, mode):
+    """用给定字体渲染一个条带（mode 为 "RGB" 或单通道蒙版 "L"）"""
+    if mode == "RGB":
+        return _render_band(lines, positions, line_height, font, text_color, bg_color,
+                            img_width, top, bottom, backend)
+    band = Image.new(mode, (img_width, max(bottom - top, 1)), bg_color)
+    _draw_lines(ImageDraw.Draw(band), lines, [(x, y - top) for x, y in positions],
+                font, text_color, backend)
+    return band
+
+
+def _render_band_job(font_path, font_size, *job):
+    """进程池任务：在工作进程内加载（并缓存）字体后渲染条带"""
+    return _render_band_with(_load_font(font_path, font_size), *job)
+
+
+def _draw_lines(draw, lines, positions, font, text_color, backend="draw"):
+    """在给定坐标处逐行绘制文字"""
+    if backend not in ("draw", "atlas"):
+        raise ValueError(f"未知的绘制后端: {backend}")
+    if isinstance(font, FontChain):
+        for line, xy in zip(lines, positions):
+            font.draw_line(draw, xy, line, text_color, backend)
+    elif backend == "atlas":
+        atlas = _get_glyph_atlas(font)
+        for line, xy in zip(lines, positions):
+            atlas.draw_line(draw, xy, line, text_color)
+    else:
+        for line, xy in zip(lines, positions):
+            draw.text(xy, line, font=font, fill=text_color)
+
+
+class _GlyphAtlas:
+    """
+    字形图集：每个字符只经 FreeType 光栅化一次，之后以 alpha 蒙版贴图方式绘制
+
+    适用于同一字体、字号下大量渲染的场景。笔位与 FreeType 一样按 1/64 像素
+    累加前进宽度和字距调整（按字符对缓存），再四舍五入到整数像素放置字形，
+    因此字形位置与 draw.text 相同（不使用 raqm 复杂文字排版时）。误差范围：
+    字形逐个混合到画布上，相邻字形的墨迹重叠处与 draw.text 整行一次混合的
+    取整不同，非黑色文字或背景时逐像素通道差不超过1。
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.metrics = _get_glyph_metrics(font)
+        self.glyphs = {}
+
+    def glyph(self, char):
+        """返回 (蒙版, x偏移, y偏移)，空白字符返回 None"""
+        if char in self.glyphs:
+            return self.glyphs[char]
+        left, top, right, bottom = self.font.getbbox(char)
+        glyph = None
+        if right > left and bottom > top:
+            mask = Image.new("L", (right - left, bottom - top), 0)
+            ImageDraw.Draw(mask).text((-left, -top), char, font=self.font, fill=255)
+            glyph = (mask, left, top)
+        self.glyphs[char] = glyph
+        return glyph
+
+    def draw_line(self, draw, xy, line, fill):
+        """将一行文字按缓存的字形蒙版绘制到 draw 上"""
+        x, y = xy
+        metrics = self.metrics
+        pen = 0.0
+        prev = None
+        for char in line:
+            if prev is not None:
+                pen += metrics.kerning(prev + char)
+            glyph = self.glyph(char)
+            if glyph is not None:
+                mask, dx, dy = glyph
+                # 与 FreeType 的取整方式一致（0.5 向上取整）
+                draw.bitmap((x + math.floor(pen + 0.5) + dx, y + dy), mask, fill=fill)
+            pen += metrics.advance(char)
+            prev = char
+
+
+_GLYPH_ATLASES = weakref.WeakKeyDictionary()
+
+
+def _get_glyph_atlas(font):
+    """获取字体对应的字形图集"""
+    with _FONT_CACHE_LOCK:
+        atlas = _GLYPH_ATLASES.get(font)
+        if atlas is None:
+            atlas = _GLYPH_ATLASES[font] = _GlyphAtlas(font)
+        return atlas
+
+
+def _parse_color(value):
+    """解析颜色参数，支持"r,g,b"字符串或RGB序列"""
+    if isinstance(value, str):
+        value = value.split(",")
+    color = tuple(int(c) for c in value)
+    if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+        raise ValueError(f"颜色需为3个0-255的整数: {value}")
+    return color
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # 子命令：serve 启动常驻渲染服务
+    if argv and argv[0] == "serve":
+        from text_to_image_server import main as serve_main
+
+        return serve_main(argv[1:])
+    # 子命令：template 按模板批量渲染
+    if argv and argv[0] == "template":
+        from text_to_image_template import main as template_main
+
+        return template_main(argv[1:])
+    # 子命令：dataset 生成合成数据集
+    if argv and argv[0] == "dataset":
+        from text_to_image_dataset import main as dataset_main
+
+        return dataset_main(argv[1:])
+    # 子命令：sprites 把多个标签打包为图集
+    if argv and argv[0] == "sprites":
+        from text_to_image_sprites import main as sprites_main
+
+        return sprites_main(argv[1:])
 
-def main():
     parser = argparse.ArgumentParser(
-        description="文字转图片（支持分辨率、对齐方式、颜色控制）"
+        description="文字转图片（支持分辨率、对齐方式、颜色控制）",
+        epilog="子命令: serve 启动本地渲染服务（python text_to_image.py serve -h），"
+               "template 按模板批量渲染（python text_to_image.py template -h），"
+               "dataset 生成合成数据集（python text_to_image.py dataset -h），"
+               "sprites 把多个标签打包为图集（python text_to_image.py sprites -h）",
     )
     # 基础参数
+    parser.add_argument("--text", type=str, help="要渲染的文字（换行用\\n）")
     parser.add_argument(
-        "--text", type=str, required=True, help="要渲染的文字（换行用\\n）"
-    )
-    parser.add_argument(
-        "--font", type=str, required=True, help="字体文件路径（.ttf/.otf）"
+        "--font",
+        type=str,
+        nargs="+",
+        help="字体文件路径（.ttf/.otf），指定多个时按顺序回退缺失的字形；批量模式下作为默认字体",
     )
     parser.add_argument(
         "--output",
@@ -187,23 +1534,220 @@ def main():
     parser.add_argument(
         "--padding", type=int, default=20, help="文字与图片边缘的间距（默认20）"
     )
+    parser.add_argument(
+        "--markup",
+        action="store_true",
+        help="把 --text 作为富文本标记解析：<b>、<color=r,g,b>、<size=n>、<font=路径>",
+    )
+    parser.add_argument("--bold-font", type=str, help="富文本粗体使用的字体（默认用描边加粗）")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        help="把画布切成水平条带并发光栅化的工作者数（适合超大画布，结果与串行相同）",
+    )
+    parser.add_argument(
+        "--parallel-mode",
+        type=str,
+        default="process",
+        choices=PARALLEL_MODES,
+        help="条带并发方式：process（默认）或 thread"
+             "（FreeType光栅化不释放GIL，线程只能并行混合步骤）",
+    )
+    parser.add_argument(
+        "--fit",
+        action="store_true",
+        help="自动选择能放入 --width x --height 的最大字号（忽略 --font-size）",
+    )
+    parser.add_argument("--min-font-size", type=int, default=8, help="--fit 的最小字号（默认8）")
+    parser.add_argument("--max-font-size", type=int, default=200, help="--fit 的最大字号（默认200）")
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="draw",
+        choices=["draw", "atlas"],
+        help="绘制后端：draw逐行调用FreeType，atlas复用字形图集（大批量同字体时更快）",
+    )
+
+    # 批量模式
+    parser.add_argument(
+        "--batch",
+        type=str,
+        help="批量渲染清单（.jsonl或.csv，每条记录为一组渲染参数）",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="批量模式的工作进程数（默认CPU核数）"
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="批量模式下按完成顺序输出结果（默认按清单顺序）",
+    )
+
+    # 分页输出
+    parser.add_argument(
+        "--paginate",
+        action="store_true",
+        help="分页输出（out_0001.png、out_0002.png ...），内存占用只与单页大小有关",
+    )
+    parser.add_argument(
+        "--page-height", type=int, help="分页模式的每页高度（像素，默认使用 --height）"
+    )
+    parser.add_argument("--lines-per-page", type=int, help="分页模式的每页行数")
+    # 输出编码
+    parser.add_argument(
+        "--format",
+        type=str.lower,
+        choices=["png", "jpeg", "jpg", "webp", "ppm", "raw"],
+        help="输出格式（默认按 --output 扩展名推断；raw为原始RGB像素流，--output - 时写到标准输出）",
+    )
+    parser.add_argument(
+        "--encode",
+        type=str,
+        default="default",
+        choices=sorted(ENCODE_PRESETS),
+        help="编码预设：fast优先速度，small优先体积（默认使用Pillow默认设置）",
+    )
+    parser.add_argument("--png-compress-level", type=int, choices=range(10),
+                        metavar="0-9", help="PNG压缩级别（0最快，9最小）")
+    parser.add_argument("--optimize", action="store_true", default=None,
+                        help="PNG/JPEG额外优化体积（更慢）")
+    parser.add_argument("--quality", type=int, help="JPEG/WEBP质量（1-100）")
+    parser.add_argument("--lossless", action="store_true", default=None, help="WEBP无损编码")
+    parser.add_argument(
+        "--color-mode",
+        type=str,
+        default="auto",
+        choices=("auto",) + COLOR_MODES,
+        help="颜色模式：auto在PNG/GIF/BMP/TIFF输出时使用双色调色板（默认），rgb强制RGB；"
+             "palette只能用于上述格式",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="以JSON输出各阶段耗时、字形数、行数、像素数和编码字节数（批量模式输出分位数）",
+    )
+    # 渲染缓存
+    parser.add_argument(
+        "--cache-dir", type=str, help="磁盘渲染缓存目录，相同参数的请求直接复用已渲染文件"
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=int, default=512, help="渲染缓存大小上限（MB，默认512）"
+    )
+
+    args = parser.parse_args(argv)
+    if args.font and len(args.font) == 1:
+        args.font = args.font[0]
+
+    format = _output_format(args.output, args.format)
+    if not args.batch:
+        try:
+            _resolve_color_mode(args.color_mode, format)
+        except ValueError as e:
+            parser.error(str(e))
+    encode_opts = encode_options(
+        format,
+        args.encode,
+        compress_level=args.png_compress_level,
+        optimize=args.optimize,
+        quality=args.quality,
+        lossless=args.lossless,
+    )
+    # 指定了任何编码参数时报告编码耗时与体积
+    report_encode = args.encode != "default" or any(
+        v is not None
+        for v in (args.format, args.png_compress_level, args.optimize, args.quality, args.lossless)
+    )
+
+    if args.batch:
+        from text_to_image_batch import run_batch_cli
+
+        return run_batch_cli(args)
+
+    if args.text is None or args.font is None:
+        parser.error("未指定 --batch 时必须提供 --text 和 --font")
 
-    args = parser.parse_args()
+    # 图片写到标准输出时，其余提示信息都写到标准错误
+    log = sys.stderr if args.output == "-" else sys.stdout
 
     # 解析颜色参数（确保格式正确）
     try:
-        text_color = tuple(map(int, args.text_color.split(",")))
-        bg_color = tuple(map(int, args.bg_color.split(",")))
-        assert all(0 <= c <= 255 for c in text_color) and all(
-            0 <= c <= 255 for c in bg_color
-        )
-    except:
-        print("颜色格式错误（需为0-255的RGB值，如'255,0,0'），使用默认颜色")
+        text_color = _parse_color(args.text_color)
+        bg_color = _parse_color(args.bg_color)
+    except ValueError:
+        print("颜色格式错误（需为0-255的RGB值，如'255,0,0'），使用默认颜色", file=sys.stderr)
         text_color = (0, 0, 0)
         bg_color = (255, 255, 255)
 
-    # 调用生成函数
-    create_text_image(
+    if args.markup:
+        # 富文本不支持的选项直接报错，而不是静默忽略
+        unsupported = [name for name, used in (
+            ("--paginate", args.paginate),
+            ("--fit", args.fit),
+            ("--color-mode", args.color_mode != "auto"),
+            ("--cache-dir", args.cache_dir),
+            ("--parallel", args.parallel),
+        ) if used]
+        if unsupported:
+            parser.error(f"--markup 不能与 {'、'.join(unsupported)} 同时使用")
+        from text_to_image_rich import create_rich_text_image
+
+        stats = RenderStats() if args.profile else None
+        create_rich_text_image(
+            args.text,
+            args.font,
+            args.output,
+            format=format,
+            encode_opts=encode_opts,
+            stats=stats,
+            font_size=args.font_size,
+            text_color=text_color,
+            bg_color=bg_color,
+            width=args.width,
+            height=args.height,
+            horizontal_align=args.horizontal_align,
+            vertical_align=args.vertical_align,
+            padding=args.padding,
+            backend=args.backend,
+            bold_font_path=args.bold_font,
+        )
+        if args.profile:
+            print(json.dumps(stats.as_dict(), indent=2), file=log)
+        return
+
+    if args.fit:
+        if args.width is None or args.height is None or args.paginate:
+            parser.error("--fit 需要同时指定 --width 和 --height，且不能与 --paginate 同时使用")
+        args.font_size, iterations = fit_font_size(
+            args.text, args.font, args.width, args.height, args.padding,
+            args.min_font_size, args.max_font_size,
+        )
+        print(f"自动字号: {args.font_size}（二分查找排版 {iterations} 次）", file=log)
+
+    if args.paginate:
+        page_height = args.page_height or args.height
+        if page_height is None and args.lines_per_page is None:
+            parser.error("--paginate 需要 --page-height、--height 或 --lines-per-page")
+        create_text_pages(
+            args.text,
+            args.font,
+            args.output,
+            font_size=args.font_size,
+            text_color=text_color,
+            bg_color=bg_color,
+            width=args.width,
+            page_height=page_height,
+            lines_per_page=args.lines_per_page,
+            horizontal_align=args.horizontal_align,
+            vertical_align=args.vertical_align,
+            padding=args.padding,
+            backend=args.backend,
+            format=format,
+            encode_opts=encode_opts,
+            color_mode=args.color_mode,
+        )
+        return
+
+    params = dict(
         text=args.text,
         font_path=args.font,
         output_path=args.output,
@@ -215,8 +1759,35 @@ def main():
         horizontal_align=args.horizontal_align,
         vertical_align=args.vertical_align,
         padding=args.padding,
+        backend=args.backend,
+        format=format,
+        encode_opts=encode_opts,
+        color_mode=args.color_mode,
+        parallel=args.parallel,
+        parallel_mode=args.parallel_mode,
     )
 
+    stats = RenderStats() if args.profile or report_encode else None
+    if args.cache_dir:
+        from text_to_image_cache import (
+            RenderCache,
+            cached_create_text_image,
+            format_stats,
+        )
+
+        cache = RenderCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+        cached_create_text_image(cache, **params, stats=stats)
+        print(format_stats(cache.stats()), file=log)
+    else:
+        # 调用生成函数
+        create_text_image(**params, stats=stats)
+    if report_encode and stats.timings.get("encode") is not None:
+        print(f"编码: {format or 'PNG'} 预设 {args.encode}，"
+              f"{stats.encoded_bytes} 字节，耗时 {stats.timings['encode'] * 1000:.1f} ms",
+              file=log)
+    if args.profile:
+        print(json.dumps(stats.as_dict(), indent=2), file=log)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
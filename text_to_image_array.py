@@ -0,0 +1,112 @@
+"""
+NumPy数组输出：直接得到渲染结果的像素数组，不经过PNG编码和磁盘
+
+用于合成OCR训练数据等机器学习流水线。文字先画到单通道覆盖度蒙版上，
+再用256项颜色表按覆盖度直接查表写入目标数组（与调色板模式的着色方式相同，
+draw 后端下像素与 render_text_image 的RGB输出一致）：不产生中间的RGB图片，
+批量模式下每张图片直接写进预先分配好的大数组的对应切片。
+
+需要安装numpy: pip install numpy
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from text_to_image import _color_ramp, render_text_image
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("数组输出需要numpy库，请运行 'pip install numpy' 安装")
+
+
+def _color_table(text_color, bg_color, grayscale, normalize):
+    """覆盖度 -> 输出像素值的查找表，形状为 (256,) 或 (256, 3)"""
+    ramp = _color_ramp(text_color, bg_color)
+    if grayscale:
+        table = np.asarray(ramp.convert("L")).reshape(256)
+    else:
+        table = np.asarray(ramp).reshape(256, 3)
+    if normalize:
+        table = table.astype(np.float32) / np.float32(255)
+    return table
+
+
+def _render_mask(text, font_path, **kwargs):
+    """渲染文字覆盖度蒙版并返回数组视图（Pillow 内存只复制这一次）"""
+    mask = render_text_image(text, font_path, text_color=(255, 255, 255),
+                             bg_color=(0, 0, 0), color_mode="L", **kwargs)
+    return np.asarray(mask)
+
+
+def render_array(text, font_path, text_color=(0, 0, 0), bg_color=(255, 255, 255),
+                 grayscale=False, normalize=False, out=None, **kwargs):
+    """
+    渲染文字并返回NumPy数组
+
+    参数:
+        text: 要渲染的文字
+        font_path: 字体文件路径
+        text_color: 文字颜色(RGB元组)
+        bg_color: 背景颜色(RGB元组)
+        grayscale: True 返回 (高, 宽) 的灰度数组，否则返回 (高, 宽, 3) 的RGB数组
+        normalize: True 返回 0-1 的 float32，否则返回 uint8
+        out: 可选的目标数组，形状须与结果一致，结果直接写入其中（可为大数组的切片）
+        其余参数（font_size、width、height、对齐、padding、backend ...）
+        与 render_text_image 相同
+    """
+    _require_numpy()
+    table = _color_table(text_color, bg_color, grayscale, normalize)
+    mask = _render_mask(text, font_path, **kwargs)
+    shape = mask.shape + table.shape[1:]
+    if out is None:
+        out = np.empty(shape, dtype=table.dtype)
+    elif out.shape != shape:
+        raise ValueError(f"out 的形状 {out.shape} 与渲染结果 {shape} 不一致")
+    np.take(table, mask, axis=0, out=out)
+    return out
+
+
+def render_array_batch(items, font_path, width, height, text_color=(0, 0, 0),
+                       bg_color=(255, 255, 255), grayscale=False, normalize=False,
+                       out=None, **kwargs):
+    """
+    批量渲染同尺寸图片，堆叠为一个 (N, 高, 宽[, 3]) 数组
+
+    参数:
+        items: 文字列表；元素也可以是dict，其中 text 之外的键覆盖该条的渲染参数
+               （如 font_size、horizontal_align，颜色需为RGB元组）
+        width, height: 统一的图片尺寸（必须指定，保证可以堆叠）
+        out: 可选的预分配数组，首维不小于 len(items)；不指定时按需分配一次
+        其余参数与 render_array 相同
+    """
+    _require_numpy()
+    items = list(items)
+    tables = {}
+
+    def table_for(colors):
+        if colors not in tables:
+            tables[colors] = _color_table(*colors, grayscale, normalize)
+        return tables[colors]
+
+    sample = table_for((text_color, bg_color))
+    shape = (len(items), height, width) + sample.shape[1:]
+    if out is None:
+        out = np.empty(shape, dtype=sample.dtype)
+    elif out.shape[0] < len(items) or out.shape[1:] != shape[1:]:
+        raise ValueError(f"out 的形状 {out.shape} 放不下 {shape}")
+
+    for i, item in enumerate(items):
+        params = dict(kwargs, width=width, height=height)
+        colors = (text_color, bg_color)
+        if isinstance(item, dict):
+            item = dict(item)
+            colors = (item.pop("text_color", text_color), item.pop("bg_color", bg_color))
+            params.update(item)
+        else:
+            params["text"] = item
+        text = params.pop("text")
+        mask = _render_mask(text, params.pop("font_path", font_path), **params)
+        np.take(table_for(colors), mask, axis=0, out=out[i])
+    return out[:len(items)]
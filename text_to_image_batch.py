@@ -0,0 +1,340 @@
+"""
+批量渲染：从JSONL/CSV清单读取记录，在进程池中并行调用 create_text_image
+
+每条记录是一组 create_text_image 参数，键名既可以使用命令行参数名
+（text、font、output、font-size、text-color ...），也可以使用函数参数名
+（font_path、output_path、font_size ...）。编码参数（encode、png-compress-level、
+optimize、quality、lossless）同样可以逐条指定，按该条记录的输出格式生效。
+单条记录出错只会体现在该条结果中，不会中断整个批次。
+"""
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from text_to_image import (
+    RenderStats,
+    _load_font,
+    _output_format,
+    _parse_color,
+    create_text_image,
+    encode_options,
+    process_memory,
+    summarize_stats,
+)
+from text_to_image_cache import (
+    DEFAULT_MAX_BYTES,
+    RenderCache,
+    cached_create_text_image,
+    format_stats,
+)
+
+# 命令行参数名 -> create_text_image 参数名
+_KEY_ALIASES = {
+    "font": "font_path",
+    "output": "output_path",
+    "font-size": "font_size",
+    "text-color": "text_color",
+    "bg-color": "bg_color",
+    "horizontal-align": "horizontal_align",
+    "vertical-align": "vertical_align",
+    "color-mode": "color_mode",
+    "png-compress-level": "compress_level",
+    "png_compress_level": "compress_level",
+}
+_INT_KEYS = ("font_size", "width", "height", "padding", "compress_level", "quality")
+_COLOR_KEYS = ("text_color", "bg_color")
+# 编码参数（与命令行的 --encode/--png-compress-level/--optimize/--quality/--lossless 对应），
+# 按每条记录的输出格式组合为 encode_opts
+_ENCODE_KEYS = ("encode", "compress_level", "optimize", "quality", "lossless")
+_BOOL_KEYS = ("optimize", "lossless")
+_PARAM_KEYS = (
+    "text",
+    "font_path",
+    "output_path",
+    "font_size",
+    "text_color",
+    "bg_color",
+    "width",
+    "height",
+    "horizontal_align",
+    "vertical_align",
+    "padding",
+    "backend",
+    "format",
+    "encode_opts",
+    "color_mode",
+) + _ENCODE_KEYS
+
+
+def read_manifest(path):
+    """逐条读取清单文件（.csv按表头解析，其余按JSONL解析）"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield row
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                # 解析失败的行也作为一条记录交给渲染流程报告错误
+                yield {"_error": f"第{line_no}行JSON解析失败: {e}"}
+
+
+def normalize_record(record, defaults=None, require_output=True):
+    """
+    将一条清单记录转换为 create_text_image 的关键字参数
+
+    require_output 为 False 时不要求 output 字段（用于只在内存中渲染的调用方）
+    """
+    if "_error" in record:
+        raise ValueError(record["_error"])
+
+    params = dict(defaults or {})
+    for key, value in record.items():
+        key = _KEY_ALIASES.get(key, key).replace("-", "_")
+        # CSV中的空单元格视为未指定
+        if value is None or value == "":
+            continue
+        params[key] = value
+
+    unknown = set(params) - set(_PARAM_KEYS)
+    if unknown:
+        raise ValueError(f"未知参数: {', '.join(sorted(unknown))}")
+    required = ("text", "output_path") if require_output else ("text",)
+    for key in required:
+        if key not in params:
+            raise ValueError(f"缺少参数: {key}")
+
+    params["text"] = str(params["text"])
+    params.setdefault("font_path", "")
+    for key in _INT_KEYS:
+        if key in params:
+            params[key] = int(params[key])
+    for key in _COLOR_KEYS:
+        if key in params:
+            params[key] = _parse_color(params[key])
+    for key in _BOOL_KEYS:
+        if key in params:
+            params[key] = _parse_bool(params[key])
+
+    encode_args = {key: params.pop(key) for key in _ENCODE_KEYS if key in params}
+    if encode_args:
+        params["encode_opts"] = encode_options(
+            _output_format(params.get("output_path", ""), params.get("format")),
+            encode_args.pop("encode", "default"),
+            **encode_args,
+        )
+    return params
+
+
+def _parse_bool(value):
+    """解析布尔参数，CSV中为 true/false/1/0 等字符串"""
+    if isinstance(value, str):
+        if value.strip().lower() in ("1", "true", "yes", "y"):
+            return True
+        if value.strip().lower() in ("0", "false", "no", "n"):
+            return False
+        raise ValueError(f"无效的布尔值: {value}")
+    return bool(value)
+
+
+# 工作进程内的渲染缓存（由 _init_worker 创建）
+_worker_cache = None
+
+
+def _init_worker(font_specs, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+    """工作进程初始化：预先加载常用字体，使后续渲染直接命中字体缓存"""
+    global _worker_cache
+    for font_path, font_size in font_specs:
+        _load_font(font_path, font_size)
+    _worker_cache = RenderCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+
+def _render_record(index, record, defaults, profile=False):
+    """渲染单条记录，异常被捕获并作为结果返回"""
+    result = {"index": index, "ok": False, "output": None, "size": None,
+              "cached": False, "stats": None, "error": None, "pid": os.getpid(),
+              "memory": None}
+    try:
+        params = normalize_record(record, defaults)
+        result["output"] = params["output_path"]
+        stats = RenderStats() if profile else None
+        if _worker_cache is not None:
+            result["size"], result["cached"] = cached_create_text_image(
+                _worker_cache, **params, stats=stats
+            )
+        else:
+            result["size"] = create_text_image(**params, stats=stats)
+        if stats is not None and not result["cached"]:
+            result["stats"] = stats.as_dict()
+        if profile:
+            result["memory"] = process_memory()
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def render_batch(
+    records,
+    workers=None,
+    ordered=True,
+    defaults=None,
+    preload_fonts=(),
+    cache_dir=None,
+    cache_max_bytes=DEFAULT_MAX_BYTES,
+    profile=False,
+):
+    """
+    批量渲染一组记录，以生成器方式逐条返回结果
+
+    参数:
+        records: 可迭代的记录（dict），每条为一组渲染参数
+        workers: 工作进程数，None为CPU核数，0或1表示在当前进程内渲染
+        ordered: True按输入顺序返回结果，False按完成顺序返回
+        defaults: 记录中未指定参数时使用的默认值
+        preload_fonts: 工作进程启动时预加载的 (字体路径, 字号) 列表
+        cache_dir: 磁盘渲染缓存目录，None表示不使用缓存
+        cache_max_bytes: 磁盘渲染缓存的大小上限（字节）
+        profile: 为每条记录收集 RenderStats（结果中的 stats 字段）和渲染后
+                 工作进程的内存占用（memory 字段，见 process_memory）
+
+    每条结果为dict: index、ok、output、size、cached、stats、error、pid、memory
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    jobs = ((index, record, defaults, profile) for index, record in enumerate(records))
+    init_args = (tuple(preload_fonts), cache_dir, cache_max_bytes)
+    yield from _map_bounded(_render_record, jobs, workers, _init_worker, init_args, ordered)
+
+
+def _map_bounded(worker, jobs, workers, initializer, initargs=(), ordered=True):
+    """
+    在进程池中对每个 jobs 元素调用 worker(*job)，以生成器方式返回结果
+
+    在途任务数有上限（workers * 4），避免一次性提交整个输入占用大量内存；
+    workers 为0或1时先调用 initializer(*initargs)，再在当前进程内逐个执行。
+    ordered 为 True 时按输入顺序返回，否则按完成顺序返回
+    """
+    if workers <= 1:
+        initializer(*initargs)
+        for job in jobs:
+            yield worker(*job)
+        return
+
+    max_pending = workers * 4
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(worker, *job))
+            if len(pending) >= max_pending:
+                yield from _drain(pending, ordered, block_until=max_pending - workers)
+        yield from _drain(pending, ordered, block_until=0)
+
+
+def _drain(pending, ordered, block_until):
+    """取出已完成的任务结果，直到在途任务数不超过 block_until"""
+    while len(pending) > block_until:
+        if ordered:
+            yield pending.popleft().result()
+            continue
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+
+def _default_output_pattern(output_path):
+    """由 --output 推导批量输出文件名，如 output.png -> output_00001.png"""
+    stem, ext = os.path.splitext(output_path)
+    return stem + "_{index:05d}" + (ext or ".png")
+
+
+def run_batch_cli(args):
+    """命令行批量模式入口，返回进程退出码"""
+    defaults = {
+        "font_size": args.font_size,
+        "text_color": args.text_color,
+        "bg_color": args.bg_color,
+        "horizontal_align": args.horizontal_align,
+        "vertical_align": args.vertical_align,
+        "padding": args.padding,
+        "backend": args.backend,
+        "format": args.format,
+        "color_mode": args.color_mode,
+        "encode": args.encode,
+    }
+    # 编码参数按每条记录的输出格式组合，记录中的同名字段优先
+    for key, value in (("compress_level", args.png_compress_level), ("optimize", args.optimize),
+                       ("quality", args.quality), ("lossless", args.lossless)):
+        if value is not None:
+            defaults[key] = value
+    if args.font:
+        defaults["font_path"] = args.font
+    if args.width:
+        defaults["width"] = args.width
+    if args.height:
+        defaults["height"] = args.height
+
+    pattern = _default_output_pattern(args.output)
+
+    def records():
+        for index, record in enumerate(read_manifest(args.batch)):
+            if not record.get("output") and not record.get("output_path"):
+                record = dict(record, output=pattern.format(index=index))
+            yield record
+
+    preload = [(args.font, args.font_size)] if args.font else []
+    succeeded = failed = 0
+    cache_hits = bytes_saved = 0
+    profiles = []
+    worker_memory = {}
+    for result in render_batch(
+        records(),
+        workers=args.workers,
+        ordered=not args.unordered,
+        defaults=defaults,
+        preload_fonts=preload,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        profile=args.profile,
+    ):
+        if result["stats"] is not None:
+            profiles.append(result["stats"])
+        if result["memory"] is not None:
+            worker_memory[result["pid"]] = result["memory"]
+        if result["ok"]:
+            succeeded += 1
+            if result["cached"]:
+                cache_hits += 1
+                bytes_saved += os.path.getsize(result["output"])
+        else:
+            failed += 1
+            print(f"第{result['index']}条记录渲染失败: {result['error']}")
+
+    print(f"批量渲染完成: 成功 {succeeded} 条，失败 {failed} 条")
+    if args.cache_dir:
+        print(format_stats({
+            "hits": cache_hits,
+            "misses": succeeded - cache_hits,
+            "hit_ratio": cache_hits / succeeded if succeeded else 0.0,
+            "bytes_saved": bytes_saved,
+        }))
+    if args.profile:
+        print(json.dumps(summarize_stats(profiles), indent=2))
+        for pid, usage in sorted(worker_memory.items()):
+            print(f"工作进程 {pid}: " + "，".join(
+                f"{name.upper()} {value / 1024 / 1024:.1f} MB" for name, value in usage.items()
+            ))
+    return 1 if failed else 0
@@ -0,0 +1,239 @@
+"""
+按内容寻址的磁盘渲染缓存
+
+缓存键是所有影响输出的参数（文字、字体文件摘要、字号、颜色、尺寸、对齐、
+边距、绘制后端、输出格式以及Pillow版本）的SHA-256。命中时直接复制（或硬链接）
+缓存文件到输出路径，跳过渲染与编码；缓存总大小超过预算时按最近使用时间淘汰。
+图片尺寸记录在每个条目旁的小文件（.meta）中，命中时无需解码缓存文件，
+因此不带文件头的 RAW 输出也能命中。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import PIL
+
+from text_to_image import create_text_image
+
+# 缓存格式版本，渲染逻辑发生不兼容变化时递增使旧缓存失效
+_CACHE_VERSION = 1
+# 条目旁记录图片尺寸的小文件的后缀
+_META_SUFFIX = ".meta"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 字体文件摘要，按 (路径, 修改时间, 文件大小) 记忆，避免重复读取大字体
+_FONT_DIGESTS = {}
+_FONT_DIGESTS_LOCK = threading.Lock()
+
+
+def font_digest(font_path):
+    """计算字体文件内容的SHA-256，空路径表示Pillow内置字体，字体回退链逐个计算"""
+    if isinstance(font_path, (list, tuple)):
+        return "+".join(font_digest(path) for path in font_path)
+    if not font_path:
+        return f"default-{PIL.__version__}"
+    try:
+        resolved = os.path.realpath(font_path)
+        st = os.stat(resolved)
+    except OSError:
+        # 字体不存在时渲染会回退到内置字体，摘要也随之回退
+        return f"missing-{PIL.__version__}"
+
+    file_key = (resolved, st.st_mtime_ns, st.st_size)
+    with _FONT_DIGESTS_LOCK:
+        digest = _FONT_DIGESTS.get(file_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(resolved, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _FONT_DIGESTS_LOCK:
+            _FONT_DIGESTS[file_key] = digest
+    return digest
+
+
+class RenderCache:
+    """
+    磁盘渲染缓存
+
+    参数:
+        cache_dir: 缓存目录，不存在时自动创建
+        max_bytes: 缓存文件总大小上限（字节）
+        link: 命中时使用硬链接代替复制（输出文件与缓存共享数据，不要原地修改）
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, link=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def key(self, params):
+        """根据渲染参数计算缓存键"""
+        params = dict(params)
+        output_path = params.pop("output_path", "")
+        fmt = os.path.splitext(output_path)[1].lower() or ".png"
+        material = {
+            "version": _CACHE_VERSION,
+            "pillow": PIL.__version__,
+            "font": font_digest(params.pop("font_path", "")),
+            "format": fmt,
+            "params": {k: list(v) if isinstance(v, tuple) else v
+                       for k, v in sorted(params.items())},
+        }
+        blob = json.dumps(material, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest() + fmt
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """命中时将缓存文件放到 output_path 并返回图片尺寸，未命中返回 None"""
+        path = self._path(key)
+        try:
+            # 先确认条目完整（尺寸记录和数据都在），再放置到输出路径
+            with open(path + _META_SUFFIX, encoding="utf-8") as f:
+                dimensions = tuple(json.load(f)["size"])
+            size = os.path.getsize(path)
+            _place(path, output_path, self.link)
+            # 更新修改时间作为LRU的最近使用时间
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # 未命中，或条目恰好被其他进程淘汰
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+        return dimensions
+
+    def store(self, key, src_path, dimensions):
+        """将已渲染的文件及其尺寸存入缓存（先写临时文件再原子替换）"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # 覆盖已有条目时不重复计入总大小
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        with open(src_path, "rb") as src:
+            _atomic_write(path, lambda dst: shutil.copyfileobj(src, dst))
+        _atomic_write(path + _META_SUFFIX,
+                      lambda dst: dst.write(json.dumps({"size": list(dimensions)}).encode()))
+        with self._lock:
+            self._total_bytes += os.path.getsize(path) - old_size
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """按最近使用时间从旧到新删除条目，直到总大小低于预算的90%"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            try:
+                os.unlink(path + _META_SUFFIX)
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._total_bytes = total
+
+    def _entries(self):
+        """遍历缓存条目，返回 (路径, 大小, 修改时间)"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith((".tmp", _META_SUFFIX)):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def stats(self):
+        """返回命中、未命中、命中率和节省的字节数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "cache_bytes": self._total_bytes,
+            }
+
+
+def _atomic_write(path, write):
+    """先写同目录下的临时文件再原子替换，失败时删除临时文件"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _place(src, dst, link):
+    """将缓存文件放到输出路径：硬链接失败（如跨文件系统）时退回复制"""
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    if link:
+        try:
+            if os.path.lexists(dst):
+                os.unlink(dst)
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+def cached_create_text_image(cache, **params):
+    """
+    带缓存的 create_text_image，参数与 create_text_image 相同
+    （命中缓存时不会渲染，stats 不会被填充；输出到标准输出时不使用缓存）
+
+    返回 ((宽, 高), 是否命中缓存)
+    """
+    stats = params.pop("stats", None)
+    output_path = params["output_path"]
+    if output_path == "-":
+        return create_text_image(**params, stats=stats), False
+    key = cache.key(params)
+    dimensions = cache.fetch(key, output_path)
+    if dimensions is not None:
+        print(f"图片已保存至: {output_path}（缓存命中，分辨率：{dimensions[0]}x{dimensions[1]}）")
+        return dimensions, True
+    dimensions = create_text_image(**params, stats=stats)
+    cache.store(key, output_path, dimensions)
+    return dimensions, False
+
+
+def format_stats(stats):
+    """格式化缓存统计信息"""
+    return (
+        f"缓存命中率: {stats['hit_ratio']:.1%}（命中 {stats['hits']}，"
+        f"未命中 {stats['misses']}），节省 {stats['bytes_saved']} 字节"
+    )
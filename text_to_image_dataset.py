@@ -0,0 +1,341 @@
+"""
+合成数据集生成：按配置的分布随机采样渲染参数，并行渲染后顺序写入tar分片
+
+每个样本在分片中对应两个文件（WebDataset格式）：<key>.png 和 <key>.json（标注）。
+百万量级的小图片只产生数千个分片文件，不会撑爆文件系统的元数据。
+
+确定性与断点续跑：第 i 个样本的参数只由 (seed, i) 决定，与工作进程数和完成
+顺序无关；分片先写临时文件，写完再原子重命名，重新运行时跳过已完成的分片，
+从第一个未完成的分片继续。
+
+采样配置（JSON，均可省略）示例:
+    {
+      "font_size": {"uniform": [16, 64]},
+      "text_color": "random",
+      "bg_color": ["255,255,255", "240,240,230"],
+      "horizontal_align": ["left", "center", "right"],
+      "padding": {"uniform": [4, 24]},
+      "height": 64,
+      "chars": {"uniform": [4, 32]},
+      "min_contrast": 96
+    }
+常量表示固定值，列表表示等概率选择，{"uniform": [a, b]} 表示 [a, b] 内的均匀整数，
+颜色为 "random" 时随机生成；chars 为从语料行中截取的字符数。
+
+命令行:
+    python text_to_image.py dataset --fonts 字体目录 --corpus 语料.txt \\
+        --output-dir out --count 1000000 --shard-size 5000 --seed 42
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import tarfile
+import time
+
+from text_to_image import (
+    ENCODE_PRESETS,
+    _auto_color_mode,
+    _get_coverage,
+    _parse_color,
+    encode,
+    encode_options,
+    render_text_image,
+)
+from text_to_image_batch import _map_bounded
+from text_to_image_cache import font_digest
+
+_FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+_FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+DEFAULT_CONFIG = {
+    "font_size": {"uniform": [16, 64]},
+    "text_color": "random",
+    "bg_color": "random",
+    "horizontal_align": ["left", "center", "right"],
+    "vertical_align": ["top", "center", "bottom"],
+    "padding": {"uniform": [4, 24]},
+    "width": None,
+    "height": None,
+    "chars": {"uniform": [4, 32]},
+    "min_contrast": 96,
+}
+
+
+def list_fonts(font_dir):
+    """列出目录（含子目录）中的字体文件，按路径排序以保证可复现"""
+    fonts = []
+    for root, _, files in os.walk(font_dir):
+        for name in files:
+            if name.lower().endswith(_FONT_EXTENSIONS):
+                fonts.append(os.path.join(root, name))
+    return sorted(fonts)
+
+
+def read_corpus(path):
+    """读取语料文件，每个非空行为一条文本"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _file_digest(path):
+    """计算文件内容的SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sample(spec, rng):
+    """按分布配置采样一个值"""
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    if isinstance(spec, dict) and "uniform" in spec:
+        low, high = spec["uniform"]
+        return rng.randint(low, high)
+    return spec
+
+
+def _sample_color(spec, rng):
+    if spec == "random":
+        return tuple(rng.randrange(256) for _ in range(3))
+    return _parse_color(_sample(spec, rng))
+
+
+def _luminance(color):
+    r, g, b = color
+    return 0.299 * r + 0.587 * g + 0.114 * b
+
+
+def _covered(coverage, text):
+    """字体的覆盖位图是否包含 text 中所有非空白字符（None 表示无法解析，视为包含）"""
+    if coverage is None:
+        return True
+    return all(coverage[ord(char) >> 3] & (1 << (ord(char) & 7))
+               for char in text if not char.isspace())
+
+
+def sample_params(index, seed, config, fonts, corpus, coverages=None):
+    """
+    采样第 index 个样本的渲染参数（只由 seed 和 index 决定）
+
+    字体只从包含该样本全部字形的字体中选择（coverages 为各字体的覆盖位图，
+    见 _get_coverage），没有字体能渲染的文本重新采样，避免缺字方框被标注为原文。
+
+    返回 render_text_image 的关键字参数
+    """
+    rng = random.Random(f"{seed}:{index}")
+    if coverages is None:
+        coverages = [None] * len(fonts)
+    for _ in range(32):
+        line = rng.choice(corpus)
+        chars = _sample(config["chars"], rng)
+        if chars and len(line) > chars:
+            start = rng.randrange(len(line) - chars + 1)
+            line = line[start:start + chars].strip() or line
+        candidates = [font for font, coverage in zip(fonts, coverages) if _covered(coverage, line)]
+        if candidates:
+            break
+    else:
+        raise ValueError(f"没有字体包含样本文字的全部字形: {line}")
+
+    text_color = _sample_color(config["text_color"], rng)
+    # 文字与背景亮度差不足时重新采样背景，避免生成看不清的样本
+    for _ in range(32):
+        bg_color = _sample_color(config["bg_color"], rng)
+        if abs(_luminance(text_color) - _luminance(bg_color)) >= config["min_contrast"]:
+            break
+    return {
+        "text": line,
+        "font_path": rng.choice(candidates),
+        "font_size": _sample(config["font_size"], rng),
+        "text_color": text_color,
+        "bg_color": bg_color,
+        "width": _sample(config["width"], rng),
+        "height": _sample(config["height"], rng),
+        "horizontal_align": _sample(config["horizontal_align"], rng),
+        "vertical_align": _sample(config["vertical_align"], rng),
+        "padding": _sample(config["padding"], rng),
+    }
+
+
+# 工作进程内的生成状态（由 _init_worker 设置）
+_worker_state = None
+
+
+def _init_worker(seed, config, fonts, corpus_path, format, encode_opts):
+    """工作进程初始化：每个进程只读取一次语料和字体覆盖索引"""
+    global _worker_state
+    coverages = [_get_coverage(path, None) for path in fonts]
+    _worker_state = (seed, config, fonts, coverages, read_corpus(corpus_path), format, encode_opts)
+
+
+def _render_sample(index):
+    """渲染一个样本，返回 (index, 图片字节, 标注)；失败时图片字节为 None"""
+    seed, config, fonts, coverages, corpus, format, encode_opts = _worker_state
+    try:
+        params = sample_params(index, seed, config, fonts, corpus, coverages)
+    except ValueError as e:
+        return index, None, {"error": str(e)}
+    label = dict(params, font=os.path.basename(params["font_path"]))
+    del label["font_path"]
+    try:
+        img = render_text_image(**params, color_mode=_auto_color_mode(format))
+        data = encode(img, format, **encode_opts)
+    except Exception as e:
+        return index, None, dict(label, error=f"{type(e).__name__}: {e}")
+    label["width"], label["height"] = img.size
+    return index, data, label
+
+
+def _add_member(tar, name, data):
+    """向tar中添加一个文件（固定的时间戳和权限，保证相同输入得到相同的分片字节）"""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mode = 0o644
+    tar.addfile(info, io.BytesIO(data))
+
+
+def shard_path(output_dir, shard):
+    return os.path.join(output_dir, f"shard-{shard:06d}.tar")
+
+
+def generate_dataset(output_dir, font_dir, corpus_path, count, shard_size=1000, seed=0,
+                     config=None, workers=None, format="PNG", encode_opts=None):
+    """
+    生成合成数据集并写入tar分片
+
+    参数:
+        output_dir: 输出目录，其中写入 dataset.json（生成配置）和 shard-000000.tar ...
+        font_dir: 字体目录，每个样本从中随机选择一个包含其全部字形的字体
+        corpus_path: 语料文件，每个非空行为一条文本
+        count: 样本总数
+        shard_size: 每个分片的样本数
+        seed: 随机种子，相同的种子和配置生成逐字节相同的分片
+        config: 采样配置（见模块说明），未指定的项使用 DEFAULT_CONFIG
+        workers: 工作进程数，None为CPU核数，0或1表示在当前进程内渲染
+        format: 图片格式（PNG/JPEG/WEBP）
+        encode_opts: 编码参数（见 encode_options）
+
+    返回 dict: written（本次写入的样本数）、failed、skipped_shards、seconds
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的采样配置: {', '.join(sorted(unknown))}")
+    fonts = list_fonts(font_dir)
+    if not fonts:
+        raise ValueError(f"字体目录中没有字体文件: {font_dir}")
+    if not read_corpus(corpus_path):
+        raise ValueError(f"语料文件为空: {corpus_path}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    encode_opts = encode_opts or {}
+
+    # 记录生成配置以及语料和字体的内容摘要；续跑时必须一致，
+    # 否则已有分片与新样本不属于同一个数据集
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        "seed": seed,
+        "count": count,
+        "shard_size": shard_size,
+        "format": format,
+        "encode_opts": encode_opts,
+        "config": config,
+        "fonts": {os.path.relpath(path, font_dir): font_digest(path) for path in fonts},
+        "corpus": {"file": os.path.basename(corpus_path), "sha256": _file_digest(corpus_path)},
+    }
+    manifest_path = os.path.join(output_dir, "dataset.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) != json.loads(json.dumps(manifest)):
+                raise ValueError(f"{output_dir} 中已有不同配置（或不同的语料、字体文件）生成的数据集")
+    else:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    num_shards = (count + shard_size - 1) // shard_size
+    todo = [k for k in range(num_shards) if not os.path.exists(shard_path(output_dir, k))]
+
+    def indices():
+        for shard in todo:
+            yield from range(shard * shard_size, min((shard + 1) * shard_size, count))
+
+    ext = "jpg" if format == "JPEG" else format.lower()
+    init_args = (seed, config, fonts, corpus_path, format, encode_opts)
+    results = _map_bounded(_render_sample, ((index,) for index in indices()), workers,
+                           _init_worker, init_args)
+    written = failed = 0
+    start = time.perf_counter()
+    for shard in todo:
+        path = shard_path(output_dir, shard)
+        tmp_path = path + ".tmp"
+        with tarfile.open(tmp_path, "w") as tar:
+            for _ in range(shard * shard_size, min((shard + 1) * shard_size, count)):
+                index, data, label = next(results)
+                if data is None:
+                    failed += 1
+                    print(f"第{index}个样本渲染失败: {label['error']}")
+                    continue
+                key = f"{index:09d}"
+                _add_member(tar, f"{key}.{ext}", data)
+                _add_member(tar, f"{key}.json",
+                            json.dumps(label, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+                written += 1
+        os.replace(tmp_path, path)
+        elapsed = time.perf_counter() - start
+        print(f"已写入分片 {os.path.basename(path)}（累计 {written} 张，"
+              f"{written / elapsed if elapsed else 0:.1f} 张/秒）")
+    return {
+        "written": written,
+        "failed": failed,
+        "skipped_shards": num_shards - len(todo),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成文字图片数据集（tar分片 + JSON标注）")
+    parser.add_argument("--fonts", type=str, required=True, help="字体目录")
+    parser.add_argument("--corpus", type=str, required=True, help="语料文件（每行一条文本）")
+    parser.add_argument("--output-dir", type=str, required=True, help="输出目录")
+    parser.add_argument("--count", type=int, required=True, help="样本总数")
+    parser.add_argument("--shard-size", type=int, default=1000, help="每个分片的样本数（默认1000）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（默认0）")
+    parser.add_argument("--config", type=str, help="采样配置文件（JSON）")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--format", type=str.lower, default="png", choices=sorted(_FORMATS),
+                        help="图片格式（默认png）")
+    parser.add_argument("--encode", type=str, default="default",
+                        choices=sorted(ENCODE_PRESETS), help="编码预设")
+    args = parser.parse_args(argv)
+
+    config = None
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    format = _FORMATS[args.format]
+    try:
+        summary = generate_dataset(
+            args.output_dir,
+            args.fonts,
+            args.corpus,
+            args.count,
+            shard_size=args.shard_size,
+            seed=args.seed,
+            config=config,
+            workers=args.workers,
+            format=format,
+            encode_opts=encode_options(format, args.encode),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"数据集生成完成: 写入 {summary['written']} 张，失败 {summary['failed']} 张，"
+          f"跳过已完成的分片 {summary['skipped_shards']} 个，耗时 {summary['seconds']:.1f} 秒")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    main()
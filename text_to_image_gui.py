@@ -1,11 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, colorchooser, filedialog, scrolledtext
 from tkinter import messagebox
-from PIL import Image, ImageTk
-import os
-import tempfile
+from PIL import ImageTk
+import queue
+import threading
 # 导入重构后的模块，复用核心功能
-from text_to_image import create_text_image
+from text_to_image import SIZE_PRESETS, TextLayout, create_text_image
+
+# 预览防抖间隔（毫秒）：连续输入或拖动滑块时只渲染最后一次设置
+PREVIEW_DEBOUNCE_MS = 120
+# 轮询后台渲染结果的间隔（毫秒）
+PREVIEW_POLL_MS = 20
 
 class TextToImageGUI:
     def __init__(self, root):
@@ -28,10 +33,22 @@ class TextToImageGUI:
             "text": ""
         }
         
-        # 临时文件用于预览
-        self.temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
-        
-        # 绑定窗口关闭事件，用于清理临时文件
+        # 后台预览渲染：主线程只负责收集设置和显示结果
+        self._preview_after_id = None
+        self._preview_poll_id = None
+        self._preview_generation = 0
+        self._preview_submitted = 0
+        self._preview_job = None
+        self._preview_cond = threading.Condition()
+        self._preview_results = queue.Queue()
+        self._preview_closing = False
+        self._preview_layout = None  # 仅由后台线程访问
+        self._preview_thread = threading.Thread(target=self._preview_worker, daemon=True)
+        self._preview_thread.start()
+        self.preview_image = None
+        self.preview_item = None
+        
+        # 绑定窗口关闭事件，用于清理资源
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # 创建初始页面
@@ -46,19 +63,11 @@ class TextToImageGUI:
         
         ttk.Label(frame, text="选择图片尺寸", font=("Arial", 16)).pack(pady=20)
         
-        # 预设尺寸
-        sizes = [
-            ("小 (400x300)", 400, 300),
-            ("中 (800x600)", 800, 600),
-            ("大 (1200x900)", 1200, 900),
-            ("正方形 (600x600)", 600, 600),
-            ("宽屏 (1920x1080)", 1920, 1080)
-        ]
-        
         size_frame = ttk.Frame(frame)
         size_frame.pack(fill=tk.X, pady=10)
         
-        for name, w, h in sizes:
+        # 预设尺寸
+        for name, w, h in SIZE_PRESETS:
             ttk.Button(
                 size_frame, 
                 text=name,
@@ -249,7 +258,7 @@ class TextToImageGUI:
         self.update_preview()
 
     def update_preview(self, event=None):
-        """更新预览图"""
+        """更新预览图（防抖后交给后台线程渲染）"""
         # 更新设置
         self.settings["text"] = self.text_input.get("1.0", tk.END).rstrip("\n")
         self.settings["font_path"] = self.font_path_var.get()
@@ -260,34 +269,123 @@ class TextToImageGUI:
         self.settings["vertical_align"] = self.vertical_align_var.get()
         self.settings["padding"] = self.padding_var.get()
         
-        # 生成预览图
-        try:
-            self.create_text_image(self.temp_file)
-            
-            # 显示预览图
-            img = Image.open(self.temp_file)
-            # 调整预览大小以适应窗口，但保持比例
-            canvas_width = self.preview_canvas.winfo_width() or 600
-            canvas_height = self.preview_canvas.winfo_height() or 400
-            
-            img.thumbnail((canvas_width - 40, canvas_height - 40))
-            photo = ImageTk.PhotoImage(img)
-            
-            self.preview_canvas.delete("all")
-            self.preview_image = photo  # 保持引用
-            self.preview_canvas.create_image(
-                canvas_width//2, canvas_height//2, 
-                image=photo, anchor=tk.CENTER
-            )
-            self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
-        except Exception as e:
+        # 取消尚未触发的预览，只保留最新一次
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.root.after(PREVIEW_DEBOUNCE_MS, self._submit_preview)
+
+    def _submit_preview(self):
+        """把当前设置的快照提交给后台线程，覆盖尚未开始的旧任务"""
+        self._preview_after_id = None
+        self._preview_generation += 1
+        self._preview_submitted = self._preview_generation
+        canvas_width = self.preview_canvas.winfo_width() or 600
+        canvas_height = self.preview_canvas.winfo_height() or 400
+        job = (self._preview_generation, dict(self.settings), (canvas_width, canvas_height))
+        with self._preview_cond:
+            self._preview_job = job
+            self._preview_cond.notify()
+        if self._preview_poll_id is None:
+            self._preview_poll_id = self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+
+    def _preview_worker(self):
+        """后台线程：循环取出最新任务并渲染，渲染结果放入结果队列"""
+        while True:
+            with self._preview_cond:
+                while self._preview_job is None and not self._preview_closing:
+                    self._preview_cond.wait()
+                if self._preview_closing:
+                    return
+                generation, settings, canvas_size = self._preview_job
+                self._preview_job = None
+            # 渲染前已有更新的任务时直接跳过
+            if generation != self._preview_generation:
+                continue
+            try:
+                # 按画布大小缩放光栅化，保持比例，不再先渲染全尺寸再缩略
+                scale = min(
+                    (canvas_size[0] - 40) / settings["width"],
+                    (canvas_size[1] - 40) / settings["height"],
+                    1.0,
+                )
+                img = self.render_preview(settings, max(scale, 0.01))
+                self._preview_results.put((generation, img, canvas_size, None))
+            except Exception as e:
+                self._preview_results.put((generation, None, canvas_size, e))
+
+    def render_preview(self, settings, scale):
+        """在后台线程中用增量排版渲染预览，只重排、重绘发生变化的段落"""
+        style = dict(
+            font_path=settings["font_path"],
+            font_size=settings["font_size"],
+            text_color=settings["text_color"],
+            bg_color=settings["bg_color"],
+            width=settings["width"],
+            height=settings["height"],
+            horizontal_align=settings["horizontal_align"],
+            vertical_align=settings["vertical_align"],
+            padding=settings["padding"],
+            scale=scale
+        )
+        if self._preview_layout is None:
+            self._preview_layout = TextLayout(**style)
+        else:
+            self._preview_layout.set_style(**style)
+        # 排版对象的图片会被下一次渲染原地修改，交给主线程的是副本
+        return self._preview_layout.render(settings["text"]).copy()
+
+    def _poll_preview(self):
+        """主线程通过 root.after 轮询后台结果，只显示最新一代的预览"""
+        self._preview_poll_id = None
+        latest = None
+        while True:
+            try:
+                latest = self._preview_results.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None and latest[0] == self._preview_generation:
+            self.show_preview(*latest[1:])
+            return
+        if self._preview_submitted != self._preview_generation:
+            # 页面已切换，没有需要等待的任务
+            return
+        # 最新任务尚未完成，继续轮询
+        self._preview_poll_id = self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+
+    def show_preview(self, img, canvas_size, error=None):
+        """显示预览图，尺寸不变时原地更新已有的 PhotoImage"""
+        if not self.preview_canvas.winfo_exists():
+            return
+        canvas_width, canvas_height = canvas_size
+        if error is not None:
             self.preview_canvas.delete("all")
+            self.preview_item = None
+            self.preview_image = None
             self.preview_canvas.create_text(
                 50, 50, 
-                text=f"预览错误: {str(e)}", 
+                text=f"预览错误: {str(error)}", 
                 anchor=tk.NW, 
                 fill="red"
             )
+            return
+        
+        photo = self.preview_image
+        if photo is not None and (photo.width(), photo.height()) == img.size:
+            photo.paste(img)
+        else:
+            photo = ImageTk.PhotoImage(img)
+            self.preview_image = photo  # 保持引用
+        
+        if self.preview_item is None:
+            self.preview_canvas.delete("all")
+            self.preview_item = self.preview_canvas.create_image(
+                canvas_width//2, canvas_height//2, 
+                image=photo, anchor=tk.CENTER
+            )
+        else:
+            self.preview_canvas.itemconfigure(self.preview_item, image=photo)
+            self.preview_canvas.coords(self.preview_item, canvas_width//2, canvas_height//2)
+        self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
 
     def save_image(self):
         """保存图片"""
@@ -330,17 +428,22 @@ class TextToImageGUI:
 
     def clear_frame(self):
         """清空当前窗口内容"""
+        # 取消尚未触发的预览请求（其画布即将被销毁），并作废尚未显示的预览结果
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+            self._preview_after_id = None
+        self._preview_generation += 1
+        self.preview_image = None
+        self.preview_item = None
         for widget in self.root.winfo_children():
             widget.destroy()
     
     def on_closing(self):
         """窗口关闭时清理资源"""
-        # 尝试删除临时文件
-        try:
-            if os.path.exists(self.temp_file):
-                os.unlink(self.temp_file)
-        except:
-            pass
+        # 停止后台预览线程
+        with self._preview_cond:
+            self._preview_closing = True
+            self._preview_cond.notify()
         # 关闭窗口
         self.root.destroy()
 
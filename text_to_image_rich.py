@@ -0,0 +1,292 @@
+"""
+富文本渲染：一段文字中的不同部分（文字段）可以使用不同的字体、字号、颜色和粗体
+
+所有文字段在一次排版中完成跨段换行：每个字符的前进宽度来自其字体的字形度量
+缓存，断行规则与单一样式的 _wrap_text 相同；每行的高度取该行各文字段的最大
+ascent + descent，各文字段按公共基线对齐。行位置由 _line_positions 计算，
+对齐方式、边距和行距与 create_text_image 一致，最后在同一张画布上逐段绘制。
+
+标记语法（可嵌套）:
+    <b>粗体</b>  <color=255,0,0>红色</color>  <size=60>大字</size>  <font=路径>换字体</font>
+不属于以上标签的 "<"，以及取值缺失或无效的标签（如 <size=big>），按普通文字处理。
+"""
+import math
+import re
+import sys
+
+from PIL import Image, ImageDraw
+
+from text_to_image import (
+    FontChain,
+    _break_spans,
+    _draw_lines,
+    _get_glyph_metrics,
+    _line_positions,
+    _load_font,
+    _output_format,
+    _parse_color,
+    _phase,
+    _save_image,
+)
+
+
+class Span:
+    """
+    一个文字段，未指定的样式沿用整段文字的默认样式
+
+    参数:
+        text: 文字
+        font_path: 字体文件路径（或字体回退链）
+        font_size: 字体大小
+        color: 文字颜色(RGB元组)
+        bold: 是否粗体（指定了粗体字体时换用该字体，否则用描边加粗）
+    """
+
+    def __init__(self, text, font_path=None, font_size=None, color=None, bold=False):
+        self.text = text
+        self.font_path = font_path
+        self.font_size = font_size
+        self.color = color
+        self.bold = bold
+
+    def __repr__(self):
+        return (f"Span({self.text!r}, font_path={self.font_path!r}, font_size={self.font_size!r}, "
+                f"color={self.color!r}, bold={self.bold!r})")
+
+    def __eq__(self, other):
+        return isinstance(other, Span) and vars(self) == vars(other)
+
+
+_TAG_PATTERN = re.compile(r"<(/?)(b|color|size|font)(?:=([^<>]*))?>")
+
+
+def parse_markup(markup):
+    """将标记文本解析为 Span 列表；标签未闭合时样式持续到文末，多余的闭合标签被忽略"""
+    spans = []
+    # 样式栈：每项为 (标签名, 该标签设置的属性)
+    stack = []
+
+    def current():
+        style = {"font_path": None, "font_size": None, "color": None, "bold": False}
+        for _, attrs in stack:
+            style.update(attrs)
+        return style
+
+    pos = 0
+    for match in _TAG_PATTERN.finditer(markup):
+        closing, tag, value = match.groups()
+        if closing:
+            attrs = None
+        elif tag == "b":
+            attrs = {"bold": True}
+        else:
+            attrs = _tag_attrs(tag, value)
+            if attrs is None:
+                # 缺少取值或取值无效的开始标签（如 <size> 或 <size=big>）按普通文字处理
+                continue
+        if match.start() > pos:
+            spans.append(Span(markup[pos:match.start()], **current()))
+        pos = match.end()
+        if closing:
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == tag:
+                    del stack[i]
+                    break
+        else:
+            stack.append((tag, attrs))
+    if pos < len(markup):
+        spans.append(Span(markup[pos:], **current()))
+    return spans
+
+
+def _tag_attrs(tag, value):
+    """解析 color/size/font 标签的取值，取值缺失或无效时返回 None"""
+    if value is None:
+        return None
+    try:
+        if tag == "color":
+            return {"color": _parse_color(value)}
+        if tag == "size":
+            size = int(value)
+            return {"font_size": size} if size > 0 else None
+    except ValueError:
+        return None
+    return {"font_path": value} if value else None
+
+
+class _RunStyle:
+    """解析后的文字段样式：字体对象、颜色、描边宽度和字形度量"""
+
+    def __init__(self, font, color, stroke, metrics):
+        self.font = font
+        self.color = color
+        self.stroke = stroke
+        self.metrics = metrics
+
+
+def _resolve_styles(spans, font_path, font_size, text_color, bold_font_path):
+    """为每个文字段解析样式；相同样式共享同一个 _RunStyle（字体和度量来自各自的缓存）"""
+    cache = {}
+    styles = []
+    for span in spans:
+        size = span.font_size or font_size
+        path = span.font_path or font_path
+        stroke = 0
+        if span.bold:
+            if bold_font_path:
+                path = bold_font_path
+            else:
+                stroke = max(1, round(size / 24))
+        color = tuple(span.color or text_color)
+        key = (tuple(path) if isinstance(path, list) else path, size, color, stroke)
+        style = cache.get(key)
+        if style is None:
+            font = _load_font(path, size)
+            style = cache[key] = _RunStyle(font, color, stroke, _get_glyph_metrics(font))
+        styles.append(style)
+    return styles
+
+
+def _split_paragraphs(spans, styles):
+    """按换行符把文字段切成段落，每个段落为 (文字, 每个字符的样式列表)"""
+    paragraphs = [([], [])]
+    for span, style in zip(spans, styles):
+        for i, piece in enumerate(span.text.split("\n")):
+            if i:
+                paragraphs.append(([], []))
+            pieces, char_styles = paragraphs[-1]
+            pieces.append(piece)
+            char_styles.extend([style] * len(piece))
+    return [("".join(pieces), char_styles) for pieces, char_styles in paragraphs]
+
+
+def _line_runs(text, char_styles, start, end):
+    """把一行切成同样式的连续文字段 [(样式, 文字), ...]"""
+    runs = []
+    for i in range(start, end):
+        style = char_styles[i]
+        if runs and runs[-1][0] is style:
+            runs[-1][1].append(text[i])
+        else:
+            runs.append((style, [text[i]]))
+    return [(style, "".join(chars)) for style, chars in runs]
+
+
+def layout_rich_text(spans, font_path, font_size=40, text_color=(0, 0, 0), width=None,
+                     height=None, padding=20, bold_font_path=None, stats=None):
+    """
+    富文本排版（不光栅化）
+
+    返回 (每行的文字段列表, 每行尺寸, 每行的 ascent, 文本总高度, (图片宽, 图片高))
+    """
+    if isinstance(spans, str):
+        spans = parse_markup(spans)
+    spans = [span if isinstance(span, Span) else Span(**span) if isinstance(span, dict)
+             else Span(str(span)) for span in spans]
+
+    with _phase(stats, "load_font"):
+        styles = _resolve_styles(spans, font_path, font_size, text_color, bold_font_path)
+        base = _get_glyph_metrics(_load_font(font_path, font_size))
+
+    available = max((width or 800) - 2 * padding, 1)
+    lines = []
+    with _phase(stats, "wrap"):
+        for text, char_styles in _split_paragraphs(spans, styles):
+            widths = [style.metrics.advance(char) for char, style in zip(text, char_styles)]
+            # 描边加粗的文字段两侧各多占 stroke 像素，计入该段首尾字符的宽度
+            for i, style in enumerate(char_styles):
+                if style.stroke and (i == 0 or char_styles[i - 1] is not style):
+                    widths[i] += style.stroke
+                if style.stroke and (i == len(text) - 1 or char_styles[i + 1] is not style):
+                    widths[i] += style.stroke
+            for start, end in _break_spans(text, widths, available):
+                lines.append(_line_runs(text, char_styles, start, end))
+
+    # 每行高度取各文字段的最大 ascent + descent，空行使用默认字体的行高
+    line_dimensions, ascents = [], []
+    with _phase(stats, "measure"):
+        for runs in lines:
+            if not runs:
+                line_dimensions.append((0, base.line_height))
+                ascents.append(base.ascent)
+                continue
+            line_width = sum(sum(style.metrics.widths(run)) + 2 * style.stroke
+                             for style, run in runs)
+            ascent = max(style.metrics.ascent + style.stroke for style, _ in runs)
+            descent = max(style.metrics.descent + style.stroke for style, _ in runs)
+            line_dimensions.append((math.ceil(line_width), ascent + descent))
+            ascents.append(ascent)
+
+    total_text_width = max(dim[0] for dim in line_dimensions)
+    total_text_height = sum(dim[1] for dim in line_dimensions) + \
+        (len(line_dimensions) - 1) * (font_size // 4)
+    img_size = (width or min(total_text_width + 2 * padding, 800),
+                height or (total_text_height + 2 * padding))
+    return lines, line_dimensions, ascents, total_text_height, img_size
+
+
+def render_rich_text(
+    spans,
+    font_path,
+    font_size=40,
+    text_color=(0, 0, 0),
+    bg_color=(255, 255, 255),
+    width=None,
+    height=None,
+    horizontal_align="center",
+    vertical_align="center",
+    padding=20,
+    backend="draw",
+    bold_font_path=None,
+    stats=None,
+):
+    """
+    在内存中渲染富文本并返回 PIL.Image
+
+    参数:
+        spans: 标记文本（见模块说明），或 Span / dict 组成的列表
+        font_path, font_size, text_color: 文字段未指定时使用的默认字体、字号和颜色
+        bold_font_path: 粗体字体文件；不指定时粗体用描边模拟
+        其余参数与 render_text_image 相同（行距按默认字号计算）
+    """
+    lines, line_dimensions, ascents, total_text_height, (img_width, img_height) = \
+        layout_rich_text(spans, font_path, font_size, text_color, width, height,
+                         padding, bold_font_path, stats)
+    positions = _line_positions(line_dimensions, img_width, img_height, total_text_height,
+                                horizontal_align, vertical_align, padding, font_size)
+
+    with _phase(stats, "draw"):
+        img = Image.new("RGB", (img_width, img_height), bg_color)
+        draw = ImageDraw.Draw(img)
+        for runs, ascent, (x, y) in zip(lines, ascents, positions):
+            pen = 0.0
+            for style, run in runs:
+                # 各文字段的 ascent 线对齐到该行的公共基线之上
+                xy = (x + round(pen) + style.stroke, y + ascent - style.metrics.ascent)
+                if style.stroke and not isinstance(style.font, FontChain):
+                    draw.text(xy, run, font=style.font, fill=style.color,
+                              stroke_width=style.stroke, stroke_fill=style.color)
+                else:
+                    _draw_lines(draw, [run], [xy], style.font, style.color, backend)
+                pen += sum(style.metrics.widths(run)) + 2 * style.stroke
+
+    if stats is not None:
+        stats.lines = len(lines)
+        stats.glyphs = sum(len(run) - run.count(" ") for runs in lines for _, run in runs)
+        stats.pixels = img_width * img_height
+    return img
+
+
+def create_rich_text_image(spans, font_path, output_path, format=None, encode_opts=None,
+                           stats=None, **kwargs):
+    """
+    渲染富文本并保存，参数见 render_rich_text；format、encode_opts 与 create_text_image 相同
+
+    返回 (宽, 高)
+    """
+    format = _output_format(output_path, format)
+    img = render_rich_text(spans, font_path, stats=stats, **kwargs)
+    _save_image(img, output_path, format, encode_opts, stats)
+    print(f"图片已保存至: {output_path}（分辨率：{img.width}x{img.height}）",
+          file=sys.stderr if output_path == "-" else sys.stdout)
+    return img.size
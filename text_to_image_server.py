@@ -0,0 +1,354 @@
+"""
+本地渲染服务：常驻进程 + 预热的工作进程池，避免每张图片都启动解释器和加载字体
+
+接口:
+    POST /render   请求体为JSON，字段与命令行参数一致（text、font、font-size、
+                   text-color、bg-color、width、height、horizontal-align、
+                   vertical-align、padding、backend、color-mode），另可指定 format（png/jpeg/webp）
+                   以及与命令行相同的编码参数 encode（default/fast/small）、
+                   png-compress-level、optimize、quality、lossless；返回图片字节
+    GET  /metrics  Prometheus文本格式的延迟直方图、排队深度等指标
+    GET  /healthz  存活检查
+
+启动:
+    python text_to_image.py serve --port 8080 --workers 4 --preload-font font.ttf:40
+    python text_to_image.py serve --unix-socket /tmp/text_to_image.sock
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from text_to_image import (
+    RenderStats,
+    _resolve_color_mode,
+    encode,
+    process_memory,
+    render_text_image,
+    summarize_stats,
+)
+from text_to_image_batch import _init_worker, normalize_record
+
+# 支持的输出格式 -> (Pillow格式名, Content-Type)
+_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+# 延迟直方图的桶上界（秒）
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_MAX_BODY_BYTES = 1024 * 1024
+# 计算分阶段耗时分位数时保留的最近请求数
+_RECENT_STATS = 1000
+
+
+def _render_request(params, fmt, encode_opts):
+    """在工作进程中渲染一条请求，返回 (编码后的图片字节, 分阶段统计, (进程号, 内存占用))"""
+    stats = RenderStats()
+    img = render_text_image(**params, stats=stats)
+    data = encode(img, fmt, stats=stats, **encode_opts)
+    return data, stats.as_dict(), (os.getpid(), process_memory())
+
+
+class _Metrics:
+    """服务指标：延迟直方图、在途请求数、拒绝数和错误数"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * len(_LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.in_system = 0
+        self.rejected = 0
+        self.errors = 0
+        self.recent_stats = deque(maxlen=_RECENT_STATS)
+        # 各工作进程最近一次报告的内存占用 {进程号: {"rss": ..., "pss": ...}}
+        self.worker_memory = {}
+
+    def observe(self, seconds, stats=None, worker=None):
+        with self.lock:
+            if stats is not None:
+                self.recent_stats.append(stats)
+            if worker is not None and worker[1] is not None:
+                self.worker_memory[worker[0]] = worker[1]
+            self.latency_sum += seconds
+            self.latency_count += 1
+            for i, bound in enumerate(_LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def render(self):
+        """输出Prometheus文本格式"""
+        with self.lock:
+            lines = [
+                "# HELP text_to_image_render_seconds 渲染请求延迟",
+                "# TYPE text_to_image_render_seconds histogram",
+            ]
+            for bound, count in zip(_LATENCY_BUCKETS, self.bucket_counts):
+                lines.append(f'text_to_image_render_seconds_bucket{{le="{bound}"}} {count}')
+            lines += [
+                f'text_to_image_render_seconds_bucket{{le="+Inf"}} {self.latency_count}',
+                f"text_to_image_render_seconds_sum {self.latency_sum:.6f}",
+                f"text_to_image_render_seconds_count {self.latency_count}",
+                "# TYPE text_to_image_in_flight gauge",
+                f"text_to_image_in_flight {min(self.in_system, self.workers)}",
+                "# TYPE text_to_image_queue_depth gauge",
+                f"text_to_image_queue_depth {max(self.in_system - self.workers, 0)}",
+                "# TYPE text_to_image_rejected_total counter",
+                f"text_to_image_rejected_total {self.rejected}",
+                "# TYPE text_to_image_errors_total counter",
+                f"text_to_image_errors_total {self.errors}",
+                "# HELP text_to_image_worker_memory_bytes 工作进程内存占用（rss/pss）",
+                "# TYPE text_to_image_worker_memory_bytes gauge",
+            ]
+            for pid, usage in sorted(self.worker_memory.items()):
+                for kind, value in usage.items():
+                    lines.append(
+                        f'text_to_image_worker_memory_bytes{{pid="{pid}",kind="{kind}"}} {value}'
+                    )
+            lines += [
+                "# HELP text_to_image_phase_seconds 最近请求的各阶段耗时分位数",
+                "# TYPE text_to_image_phase_seconds summary",
+            ]
+            summary = summarize_stats(self.recent_stats)
+            for phase, values in summary.items():
+                for q in ("p50", "p90", "p99"):
+                    lines.append(
+                        f'text_to_image_phase_seconds{{phase="{phase}",'
+                        f'quantile="0.{q[1:]}"}} {values[q]:.6f}'
+                    )
+                lines.append(
+                    f'text_to_image_phase_seconds_count{{phase="{phase}"}} {values["count"]}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+class RenderService:
+    """
+    渲染服务核心：管理工作进程池、排队上限和指标，与传输层（HTTP/Unix套接字）无关
+
+    参数:
+        workers: 工作进程数
+        queue_limit: 所有工作进程都忙时允许排队的请求数，超出后直接拒绝
+        preload_fonts: 工作进程启动时预加载的 (字体路径, 字号) 列表
+        timeout: 单个请求的最长等待时间（秒）
+    """
+
+    def __init__(self, workers=None, queue_limit=64, preload_fonts=(), timeout=30.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.metrics = _Metrics(self.workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(tuple(preload_fonts),),
+        )
+        # 提前拉起全部工作进程，让字体预加载发生在第一个请求之前
+        for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def try_acquire(self):
+        """占用一个排队名额，已满时返回 False"""
+        with self.metrics.lock:
+            if self.metrics.in_system >= self.workers + self.queue_limit:
+                self.metrics.rejected += 1
+                return False
+            self.metrics.in_system += 1
+            return True
+
+    def release(self):
+        with self.metrics.lock:
+            self.metrics.in_system -= 1
+
+    def render(self, request):
+        """
+        渲染一条JSON请求，返回 (图片字节, Content-Type)；参数错误抛出 ValueError
+
+        调用前须用 try_acquire 占用名额，名额由本方法释放：参数错误时立即释放，
+        否则在渲染真正结束时释放（超时后 cancel() 停不下已在运行的渲染，
+        它仍占用工作进程，因此仍计入排队名额）
+        """
+        try:
+            future, content_type = self._submit(request)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+
+        start = time.perf_counter()
+        try:
+            data, stats, worker = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+        self.metrics.observe(time.perf_counter() - start, stats, worker)
+        return data, content_type
+
+    def _submit(self, request):
+        """解析请求并提交给工作进程池，返回 (future, Content-Type)"""
+        request = dict(request)
+        fmt = str(request.pop("format", "png")).lower()
+        if fmt not in _FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        pil_format, content_type = _FORMATS[fmt]
+        # 编码参数只能通过 encode/quality 等字段指定，不接受直接透传给 Image.save 的参数
+        request.pop("encode_opts", None)
+        request["format"] = pil_format
+        params = normalize_record(request, require_output=False)
+        encode_opts = params.pop("encode_opts", {})
+        for key in ("output_path", "format"):
+            params.pop(key, None)
+        params["color_mode"] = _resolve_color_mode(params.get("color_mode", "auto"), pil_format)
+        future = self.pool.submit(_render_request, params, pil_format, encode_opts)
+        return future, content_type
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理：路由到 RenderService"""
+
+    server_version = "TextToImage/1.0"
+
+    def address_string(self):
+        # Unix套接字没有客户端地址
+        return self.client_address[0] if self.client_address else "unix"
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, self.server.service.metrics.render().encode("utf-8"),
+                       "text/plain; version=0.0.4; charset=utf-8")
+        elif self.path == "/healthz":
+            self._send(200, b"ok\n", "text/plain")
+        else:
+            self._send_error(404, "未知路径")
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._send_error(404, "未知路径")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > _MAX_BODY_BYTES:
+            self._send_error(413, "请求体过大")
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("请求体必须是JSON对象")
+        except ValueError as e:
+            self._send_error(400, f"JSON解析失败: {e}")
+            return
+
+        service = self.server.service
+        if not service.try_acquire():
+            self._send_error(503, "服务繁忙，请稍后重试", {"Retry-After": "1"})
+            return
+        try:
+            data, content_type = service.render(request)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+        except FutureTimeoutError:
+            service.metrics.record_error()
+            self._send_error(504, "渲染超时")
+            return
+        except Exception as e:
+            service.metrics.record_error()
+            self._send_error(500, f"渲染失败: {type(e).__name__}: {e}")
+            return
+        self._send(200, data, content_type)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host="127.0.0.1", port=8080, unix_socket=None):
+    """创建绑定到TCP端口或Unix套接字的HTTP服务器"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = _UnixHTTPServer(unix_socket, _RenderHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), _RenderHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def _parse_font_spec(spec):
+    """解析 --preload-font 参数，格式为 路径[:字号]"""
+    path, sep, size = spec.rpartition(":")
+    if sep and size.isdigit():
+        return path, int(size)
+    return spec, 40
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文字转图片本地渲染服务")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址（默认127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口（默认8080）")
+    parser.add_argument("--unix-socket", type=str, help="改为监听Unix套接字路径")
+    parser.add_argument("--workers", type=int, help="渲染工作进程数（默认CPU核数）")
+    parser.add_argument(
+        "--queue-limit", type=int, default=64, help="工作进程全忙时允许排队的请求数（默认64）"
+    )
+    parser.add_argument(
+        "--preload-font",
+        type=str,
+        action="append",
+        default=[],
+        help="工作进程启动时预加载的字体，格式为 路径[:字号]，可重复指定",
+    )
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求的超时时间（秒）")
+    args = parser.parse_args(argv)
+
+    service = RenderService(
+        workers=args.workers,
+        queue_limit=args.queue_limit,
+        preload_fonts=[_parse_font_spec(spec) for spec in args.preload_font],
+        timeout=args.timeout,
+    )
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"渲染服务已启动: {where}（工作进程 {service.workers} 个）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+图集（sprite sheet）输出：把大量短文字标签打包进一张或几张图片，并输出坐标映射
+
+每个标签先用现有的排版和测量代码得到尺寸，再用货架（shelf）装箱算法按高度
+从大到小放入图集：同一货架上的标签高度相近，浪费的空间少。每张图集只分配
+一次画布、调用一次绘制，重复的标签只渲染一次。
+
+坐标映射（JSON）示例:
+    {"sheets": [{"file": "labels.png", "width": 1024, "height": 388}],
+     "sprites": {"开始游戏": {"sheet": 0, "x": 0, "y": 0, "w": 182, "h": 60}}}
+
+命令行:
+    python text_to_image.py sprites 标签.txt --font font.ttf --output labels.png
+"""
+import argparse
+import json
+import os
+import time
+
+from PIL import Image, ImageDraw
+
+from text_to_image import (
+    _resolve_color_mode,
+    _colorize_mask,
+    _draw_lines,
+    _layout_text,
+    _line_positions,
+    _load_font,
+    _output_format,
+    _parse_color,
+)
+
+
+class _Shelf:
+    """图集中的一行货架：高度由第一个（最高的）标签决定"""
+
+    def __init__(self, y, height):
+        self.y = y
+        self.height = height
+        self.x = 0
+
+
+def pack_rects(sizes, max_width, max_height, spacing=1):
+    """
+    货架装箱：按高度从大到小依次放入第一个放得下的货架，没有时开新货架，
+    当前图集高度不够时开新图集
+
+    参数:
+        sizes: [(宽, 高), ...]
+        max_width, max_height: 单张图集的最大尺寸
+        spacing: 相邻矩形之间的间隙（像素）
+
+    返回 (每个矩形的 (图集序号, x, y)，每张图集实际使用的 (宽, 高))
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    placements = [None] * len(sizes)
+    sheets = []  # 每张图集的货架列表
+    for i in order:
+        w, h = sizes[i]
+        if w > max_width or h > max_height:
+            raise ValueError(f"标签尺寸 {w}x{h} 超过图集上限 {max_width}x{max_height}")
+        placed = False
+        for sheet_index, shelves in enumerate(sheets):
+            for shelf in shelves:
+                if h <= shelf.height and shelf.x + w <= max_width:
+                    placements[i] = (sheet_index, shelf.x, shelf.y)
+                    shelf.x += w + spacing
+                    placed = True
+                    break
+            if placed:
+                break
+            top = shelves[-1].y + shelves[-1].height + spacing
+            if top + h <= max_height:
+                shelf = _Shelf(top, h)
+                shelves.append(shelf)
+                placements[i] = (sheet_index, 0, top)
+                shelf.x = w + spacing
+                placed = True
+                break
+        if not placed:
+            shelf = _Shelf(0, h)
+            shelf.x = w + spacing
+            sheets.append([shelf])
+            placements[i] = (len(sheets) - 1, 0, 0)
+
+    used = []
+    for sheet_index, shelves in enumerate(sheets):
+        width = max(x + sizes[i][0] for i, (s, x, _) in enumerate(placements) if s == sheet_index)
+        height = shelves[-1].y + shelves[-1].height
+        used.append((width, height))
+    return placements, used
+
+
+def render_sprite_sheets(
+    labels,
+    font_path,
+    font_size=40,
+    text_color=(0, 0, 0),
+    bg_color=(255, 255, 255),
+    horizontal_align="center",
+    padding=4,
+    spacing=1,
+    max_width=2048,
+    max_height=2048,
+    backend="draw",
+    color_mode="rgb",
+    transparent=False,
+):
+    """
+    把多个文字标签打包渲染为图集
+
+    参数:
+        labels: 文字列表，或 {标签名: 文字} 字典（坐标映射以标签名为键）
+        font_path, font_size, text_color, bg_color, horizontal_align, backend:
+            与 create_text_image 相同（多行标签按 horizontal_align 对齐）
+        padding: 每个标签四周的留白
+        spacing: 标签之间的间隙
+        max_width, max_height: 单张图集的最大尺寸，放不下时生成多张；
+            过长的标签按 min(max_width, 800) 换行
+        color_mode: 见 render_text_image（transparent 为 True 时忽略）
+        transparent: 输出RGBA图集，背景透明、文字的透明度为其覆盖度
+
+    返回 (图集图片列表, 坐标映射 {标签名: {"sheet", "x", "y", "w", "h"}}, 统计信息)
+    """
+    if not isinstance(labels, dict):
+        labels = {text: text for text in labels}
+    timings = {}
+
+    start = time.perf_counter()
+    font = _load_font(font_path, font_size)
+    # 相同文字只排版、渲染一次
+    texts = list(dict.fromkeys(labels.values()))
+    # 标签按单张图集的宽度换行（与 create_text_image 相同，最宽不超过800）
+    wrap_width = min(max_width, 800)
+    layouts = [_wrap_label(text, font, font_size, wrap_width, padding) for text in texts]
+    sizes = [layout[3] for layout in layouts]
+    timings["layout"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    placements, sheet_sizes = pack_rects(sizes, max_width, max_height, spacing)
+    timings["pack"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sheets = []
+    for sheet_index, sheet_size in enumerate(sheet_sizes):
+        lines, positions = [], []
+        for (wrapped, dims, total_height, (w, h)), (s, x, y) in zip(layouts, placements):
+            if s != sheet_index:
+                continue
+            for line, (px, py) in zip(wrapped, _line_positions(
+                dims, w, h, total_height, horizontal_align, "center", padding, font_size
+            )):
+                lines.append(line)
+                positions.append((x + px, y + py))
+        if color_mode == "rgb" and not transparent:
+            sheet = Image.new("RGB", sheet_size, bg_color)
+            _draw_lines(ImageDraw.Draw(sheet), lines, positions, font, text_color, backend)
+        else:
+            mask = Image.new("L", sheet_size, 0)
+            _draw_lines(ImageDraw.Draw(mask), lines, positions, font, 255, backend)
+            if transparent:
+                sheet = Image.new("RGBA", sheet_size, tuple(text_color) + (0,))
+                sheet.putalpha(mask)
+            else:
+                sheet = _colorize_mask(mask, text_color, bg_color, color_mode)
+        sheets.append(sheet)
+    timings["draw"] = time.perf_counter() - start
+
+    rects = {text: (s, x, y, w, h) for text, (s, x, y), (w, h) in zip(texts, placements, sizes)}
+    sprite_map = {}
+    for name, text in labels.items():
+        s, x, y, w, h = rects[text]
+        sprite_map[name] = {"sheet": s, "x": x, "y": y, "w": w, "h": h}
+
+    used_area = sum(w * h for w, h in sizes)
+    sheet_area = sum(w * h for w, h in sheet_sizes)
+    stats = {
+        "labels": len(labels),
+        "unique": len(texts),
+        "sheets": len(sheets),
+        "efficiency": used_area / sheet_area if sheet_area else 0.0,
+        "timings": timings,
+    }
+    return sheets, sprite_map, stats
+
+
+def _wrap_label(text, font, font_size, wrap_width, padding):
+    """排版单个标签：按 wrap_width 换行，图片宽度取实际文字宽度"""
+    wrapped, dims, total_height, (_, h) = \
+        _layout_text(text, font, font_size, wrap_width, None, padding)
+    w = min(max(dim[0] for dim in dims) + 2 * padding, wrap_width)
+    return wrapped, dims, total_height, (w, h)
+
+
+def create_sprite_sheets(labels, font_path, output_path, map_path=None, format=None,
+                         encode_opts=None, color_mode="auto", **kwargs):
+    """
+    打包渲染图集并保存图片和坐标映射
+
+    参数:
+        labels: 文字列表，或 {标签名: 文字} 字典
+        output_path: 图集路径；生成多张时依次为 out_0.png、out_1.png ...
+        map_path: 坐标映射JSON路径，默认与图集同名（.json）
+        format: 输出格式，默认按扩展名推断
+        encode_opts: 编码参数（见 encode_options）
+        color_mode: "auto" 在输出格式支持调色板时使用双色调色板模式
+        其余参数见 render_sprite_sheets
+
+    返回统计信息（标签数、图集数、填充率和各阶段耗时）
+    """
+    format = _output_format(output_path, format)
+    color_mode = _resolve_color_mode(color_mode, format)
+    sheets, sprite_map, stats = render_sprite_sheets(
+        labels, font_path, color_mode=color_mode, **kwargs
+    )
+
+    stem, ext = os.path.splitext(output_path)
+    paths = [output_path] if len(sheets) == 1 else \
+        [f"{stem}_{i}{ext or '.png'}" for i in range(len(sheets))]
+    start = time.perf_counter()
+    for sheet, path in zip(sheets, paths):
+        sheet.save(path, format=format, **(encode_opts or {}))
+    stats["timings"]["encode"] = time.perf_counter() - start
+
+    map_path = map_path or stem + ".json"
+    with open(map_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "sheets": [{"file": os.path.basename(path), "width": sheet.width,
+                        "height": sheet.height} for sheet, path in zip(sheets, paths)],
+            "sprites": sprite_map,
+        }, f, ensure_ascii=False, indent=2)
+
+    timings = "，".join(f"{name} {seconds * 1000:.1f} ms"
+                        for name, seconds in stats["timings"].items())
+    print(f"已打包 {stats['labels']} 个标签（去重后 {stats['unique']} 个）到 "
+          f"{stats['sheets']} 张图集，填充率 {stats['efficiency']:.1%}；{timings}")
+    print(f"坐标映射已保存至: {map_path}")
+    return stats
+
+
+def read_labels(path):
+    """读取标签文件：.json 为列表或 {标签名: 文字} 字典，其余按每行一个标签读取"""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            return json.load(f)
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把多个文字标签打包渲染为图集并输出坐标映射")
+    parser.add_argument("labels", type=str, help="标签文件（每行一个，或 .json 列表/字典）")
+    parser.add_argument("--font", type=str, default="", help="字体文件路径（默认Pillow内置字体）")
+    parser.add_argument("--output", type=str, default="sprites.png", help="图集路径（默认sprites.png）")
+    parser.add_argument("--map", type=str, help="坐标映射JSON路径（默认与图集同名）")
+    parser.add_argument("--font-size", type=int, default=40, help="字体大小（默认40）")
+    parser.add_argument("--text-color", type=str, default="0,0,0", help="文字颜色（RGB格式）")
+    parser.add_argument("--bg-color", type=str, default="255,255,255", help="背景颜色（RGB格式）")
+    parser.add_argument("--transparent", action="store_true", help="输出透明背景的RGBA图集")
+    parser.add_argument("--horizontal-align", type=str, default="center",
+                        choices=["left", "center", "right"], help="多行标签的水平对齐方式")
+    parser.add_argument("--padding", type=int, default=4, help="每个标签四周的留白（默认4）")
+    parser.add_argument("--spacing", type=int, default=1, help="标签之间的间隙（默认1）")
+    parser.add_argument("--max-size", type=int, default=2048, help="单张图集的最大边长（默认2048）")
+    parser.add_argument("--backend", type=str, default="draw", choices=["draw", "atlas"],
+                        help="绘制后端")
+    args = parser.parse_args(argv)
+
+    try:
+        text_color = _parse_color(args.text_color)
+        bg_color = _parse_color(args.bg_color)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        create_sprite_sheets(
+            read_labels(args.labels),
+            args.font,
+            args.output,
+            map_path=args.map,
+            font_size=args.font_size,
+            text_color=text_color,
+            bg_color=bg_color,
+            horizontal_align=args.horizontal_align,
+            padding=args.padding,
+            spacing=args.spacing,
+            max_width=args.max_size,
+            max_height=args.max_size,
+            backend=args.backend,
+            transparent=args.transparent,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    main()
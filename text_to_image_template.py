@@ -0,0 +1,292 @@
+"""
+模板渲染：证书、胸牌等大部分内容固定、只有少量文字变化的图片
+
+模板由背景（纯色或背景图片）和若干命名文字槽组成，每个槽有自己的字体、
+字号、颜色、矩形区域和对齐方式。模板只编译一次：背景和固定文字（定义里
+带 text 的槽）预先绘制成底图，之后每张图片只复制底图并绘制可变的槽。
+
+模板定义（JSON）示例:
+    {
+      "width": 1200, "height": 800, "background": "255,255,255",
+      "slots": [
+        {"name": "title", "text": "荣誉证书", "box": [0, 80, 1200, 120], "font-size": 72},
+        {"name": "name", "box": [200, 320, 800, 120], "font": "font.ttf",
+         "font-size": 96, "fit": true}
+      ]
+    }
+background_image 指定背景图片时画布尺寸默认取图片尺寸。
+
+命令行:
+    python text_to_image.py template 模板.json --rows 数据.csv --output cert.png --workers 4
+"""
+import argparse
+import json
+import os
+
+from PIL import Image, ImageDraw
+
+from text_to_image import (
+    ENCODE_PRESETS,
+    _draw_lines,
+    _layout_text,
+    _line_positions,
+    _load_font,
+    _output_format,
+    _parse_color,
+    encode_options,
+    fit_font_size,
+)
+from text_to_image_batch import _KEY_ALIASES, _default_output_pattern, _map_bounded, read_manifest
+
+_SLOT_KEYS = (
+    "name",
+    "text",
+    "box",
+    "font_path",
+    "font_size",
+    "text_color",
+    "horizontal_align",
+    "vertical_align",
+    "padding",
+    "backend",
+    "fit",
+    "min_font_size",
+)
+
+
+class TextSlot:
+    """
+    模板中的一个文字槽
+
+    参数:
+        name: 槽名，对应数据行中的字段名
+        box: 文字区域 (x, y, 宽, 高)
+        text: 固定文字；指定时在编译阶段绘制进底图，渲染时不再处理
+        fit: 为 True 时在 min_font_size 与 font_size 之间自动缩小字号以放入区域
+        其余参数与 create_text_image 相同
+    """
+
+    def __init__(self, name, box, text=None, font_path="", font_size=40,
+                 text_color=(0, 0, 0), horizontal_align="center",
+                 vertical_align="center", padding=0, backend="draw",
+                 fit=False, min_font_size=8):
+        if len(box) != 4:
+            raise ValueError(f"文字槽 {name} 的 box 需为 (x, y, 宽, 高)")
+        self.name = name
+        self.box = tuple(int(v) for v in box)
+        self.text = text
+        self.font_path = font_path
+        self.font_size = int(font_size)
+        self.text_color = text_color
+        self.horizontal_align = horizontal_align
+        self.vertical_align = vertical_align
+        self.padding = int(padding)
+        self.backend = backend
+        self.fit = fit
+        self.min_font_size = int(min_font_size)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由模板定义中的一项创建文字槽（键名可使用命令行参数名）"""
+        params = {}
+        for key, value in data.items():
+            params[_KEY_ALIASES.get(key, key).replace("-", "_")] = value
+        unknown = set(params) - set(_SLOT_KEYS)
+        if unknown:
+            raise ValueError(f"文字槽的未知参数: {', '.join(sorted(unknown))}")
+        if "text_color" in params:
+            params["text_color"] = _parse_color(params["text_color"])
+        return cls(**params)
+
+    def draw(self, draw, text):
+        """在画布上该槽的区域内绘制文字"""
+        x, y, width, height = self.box
+        font_size = self.font_size
+        if self.fit:
+            font_size, _ = fit_font_size(text, self.font_path, width, height,
+                                         self.padding, self.min_font_size, self.font_size)
+        font = _load_font(self.font_path, font_size)
+        lines, line_dimensions, total_text_height, _ = \
+            _layout_text(text, font, font_size, width, height, self.padding)
+        positions = _line_positions(line_dimensions, width, height, total_text_height,
+                                    self.horizontal_align, self.vertical_align,
+                                    self.padding, font_size)
+        positions = [(x + px, y + py) for px, py in positions]
+        _draw_lines(draw, lines, positions, font, self.text_color, self.backend)
+
+
+class Template:
+    """
+    编译后的模板：持有预先绘制好的底图，render 只绘制可变的文字槽
+
+    参数:
+        slots: TextSlot 列表
+        width, height: 画布尺寸（指定背景图片时默认取图片尺寸）
+        background: 背景颜色(RGB元组)
+        background_image: 背景图片路径
+    """
+
+    def __init__(self, slots, width=None, height=None, background=(255, 255, 255),
+                 background_image=None):
+        self.slots = list(slots)
+        names = [slot.name for slot in self.slots]
+        if len(set(names)) != len(names):
+            raise ValueError("文字槽名称重复")
+        self.variable_slots = [slot for slot in self.slots if slot.text is None]
+
+        if background_image:
+            with Image.open(background_image) as img:
+                base = img.convert("RGB")
+            if (width or height) and (width, height) != base.size:
+                base = base.resize((width or base.width, height or base.height))
+        else:
+            if not width or not height:
+                raise ValueError("没有背景图片时必须指定模板的 width 和 height")
+            base = Image.new("RGB", (width, height), background)
+
+        # 固定文字直接画进底图
+        draw = ImageDraw.Draw(base)
+        for slot in self.slots:
+            if slot.text is not None:
+                slot.draw(draw, slot.text)
+        # 预加载可变槽的字体，让首张图片也直接命中字体缓存
+        for slot in self.variable_slots:
+            _load_font(slot.font_path, slot.font_size)
+        self.base = base
+        self.size = base.size
+
+    @classmethod
+    def from_dict(cls, data):
+        """由模板定义（dict，通常来自JSON文件）编译模板"""
+        data = dict(data)
+        slots = [TextSlot.from_dict(slot) for slot in data.pop("slots", [])]
+        background = _parse_color(data.pop("background", "255,255,255"))
+        return cls(slots, background=background, **data)
+
+    @classmethod
+    def load(cls, path):
+        """从JSON文件加载并编译模板"""
+        return cls.from_dict(read_definition(path))
+
+    def render(self, values):
+        """
+        渲染一张图片：复制底图后绘制各可变槽
+
+        values 为 {槽名: 文字}，缺少的槽留空，未知的字段被忽略
+        """
+        img = self.base.copy()
+        draw = ImageDraw.Draw(img)
+        for slot in self.variable_slots:
+            text = values.get(slot.name)
+            if text is not None and text != "":
+                slot.draw(draw, str(text))
+        return img
+
+
+def read_definition(path):
+    """读取模板定义文件；背景图片、字体等相对路径以模板文件所在目录为准"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if data.get("background_image"):
+        data["background_image"] = os.path.join(base_dir, data["background_image"])
+    for slot in data.get("slots", []):
+        for key in ("font", "font_path"):
+            if slot.get(key):
+                slot[key] = os.path.join(base_dir, slot[key])
+    return data
+
+
+# 工作进程内编译好的模板（由 _init_worker 创建）
+_worker_template = None
+
+
+def _init_worker(definition):
+    """工作进程初始化：每个进程只编译一次模板"""
+    global _worker_template
+    _worker_template = Template.from_dict(definition)
+
+
+def _render_row(index, row, output_pattern, format, encode_opts):
+    """渲染一行数据并保存，异常被捕获并作为结果返回"""
+    result = {"index": index, "ok": False, "output": None, "error": None}
+    try:
+        if "_error" in row:
+            raise ValueError(row["_error"])
+        output_path = row.get("output") or output_pattern.format(**dict(row, index=index))
+        result["output"] = output_path
+        img = _worker_template.render(row)
+        img.save(output_path, format=format, **(encode_opts or {}))
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def render_template_batch(definition, rows, output_pattern, workers=None, ordered=True,
+                          format=None, encode_opts=None):
+    """
+    用一个模板批量渲染多行数据，以生成器方式逐条返回结果
+
+    参数:
+        definition: 模板定义（dict），在每个工作进程中编译一次
+        rows: 可迭代的数据行（dict），键为槽名；带 output 字段时作为该行的输出路径
+        output_pattern: 输出路径模板，可使用 {index} 和数据行中的字段，如 "out/{index:05d}.png"
+        workers: 工作进程数，None为CPU核数，0或1表示在当前进程内渲染
+        ordered: True按输入顺序返回结果，False按完成顺序返回
+        format: 输出格式，默认按扩展名推断
+        encode_opts: 编码参数（见 encode_options）
+
+    每条结果为dict: index、ok、output、error
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    jobs = ((index, row, output_pattern, format, encode_opts) for index, row in enumerate(rows))
+    yield from _map_bounded(_render_row, jobs, workers, _init_worker, (definition,), ordered)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按模板批量渲染文字图片")
+    parser.add_argument("template", type=str, help="模板定义文件（JSON）")
+    parser.add_argument("--rows", type=str, required=True,
+                        help="数据文件（.jsonl或.csv），每行的字段名对应模板中的槽名")
+    parser.add_argument("--output", type=str, default="output.png",
+                        help="输出路径，可包含 {index} 和数据字段，"
+                             "不含占位符时自动编号为 output_00000.png ...")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--unordered", action="store_true", help="按完成顺序输出结果")
+    parser.add_argument("--format", type=str.lower, choices=["png", "jpeg", "jpg", "webp"],
+                        help="输出格式（默认按 --output 扩展名推断）")
+    parser.add_argument("--encode", type=str, default="default", choices=sorted(ENCODE_PRESETS),
+                        help="编码预设：fast优先速度，small优先体积")
+    args = parser.parse_args(argv)
+
+    definition = read_definition(args.template)
+    # 先在当前进程编译一次，尽早发现模板定义中的错误
+    Template.from_dict(definition)
+
+    pattern = args.output if "{" in args.output else _default_output_pattern(args.output)
+    format = _output_format(args.output, args.format)
+    encode_opts = encode_options(format, args.encode)
+    succeeded = failed = 0
+    for result in render_template_batch(
+        definition,
+        read_manifest(args.rows),
+        pattern,
+        workers=args.workers,
+        ordered=not args.unordered,
+        format=format,
+        encode_opts=encode_opts,
+    ):
+        if result["ok"]:
+            succeeded += 1
+        else:
+            failed += 1
+            print(f"第{result['index']}行渲染失败: {result['error']}")
+    print(f"模板渲染完成: 成功 {succeeded} 张，失败 {failed} 张")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    main()